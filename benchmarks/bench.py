@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of pybitflyer against the local mock server
+
+    python benchmarks/bench.py [--requests 2000] [--threads 8] [--latency 0]
+
+Reports:
+    throughput -- calls per second and p50/p99 latency of ticker() per session mode
+    memory -- bytes allocated and retained per board() / executions() response
+    signing -- CPU microseconds to prepare and sign one sendchildorder request
+    decoding -- CPU microseconds to decode one board() / executions() body per codec
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pybitflyer  # noqa: E402
+from pybitflyer.codec import CODECS  # noqa: E402
+from pybitflyer.metrics import Histogram  # noqa: E402
+from mockserver import MockServer  # noqa: E402
+
+
+def new_api(server, **kwargs):
+    api = pybitflyer.API(api_key="key", api_secret="secret", **kwargs)
+    api.api_url = server.url
+    return api
+
+
+def session_modes(server):
+    pool = pybitflyer.ConnectionPool(pool_maxsize=32)
+
+    def pooled():
+        api = new_api(server, pool=pool)
+        return api.ticker
+
+    def keep_session():
+        api = new_api(server, keep_session=True)
+        return api.ticker
+
+    def new_session_per_call():
+        def call(**params):
+            with new_api(server, keep_session=True) as api:
+                return api.ticker(**params)
+        return call
+
+    return [("shared pool", pooled), ("keep_session", keep_session),
+            ("session per call", new_session_per_call)]
+
+
+def bench_throughput(server, requests, threads):
+    print("throughput: ticker(), {} requests, {} threads".format(requests, threads))
+    for name, factory in session_modes(server):
+        histogram = Histogram()
+        calls = [factory() for _ in range(threads)]
+
+        def worker(call, n):
+            for _ in range(n):
+                start = time.perf_counter()
+                call(product_code="BTC_JPY")
+                histogram.record(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(worker, calls, [requests // threads] * threads))
+        elapsed = time.perf_counter() - start
+        print("  {:<18} {:>8.0f} calls/s  p50 {:>7.3f} ms  p99 {:>7.3f} ms".format(
+            name, histogram.count / elapsed, histogram.percentile(50) * 1e3,
+            histogram.percentile(99) * 1e3))
+
+
+def bench_memory(server):
+    print("memory per response")
+    for typed in (False, True):
+        api = new_api(server, typed=typed)
+        for name, call in (("board", api.board), ("executions", lambda: api.executions(count=500))):
+            call()
+            tracemalloc.start()
+            response = call()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del response
+            print("  {:<12} typed={!s:<5} retained {:>9,} B  peak {:>9,} B".format(
+                name, typed, retained, peak))
+
+
+def bench_signing(n=100000):
+    print("signing")
+    api = pybitflyer.API(api_key="key", api_secret="secret")
+    params = {"product_code": "BTC_JPY", "child_order_type": "LIMIT", "side": "BUY",
+              "price": 10000000, "size": 0.01}
+    start = time.process_time()
+    for _ in range(n):
+        api._prepare("/v1/me/sendchildorder", "POST", params)
+    elapsed = time.process_time() - start
+    print("  sendchildorder  {:>7.2f} us CPU per request".format(elapsed / n * 1e6))
+
+
+def bench_decoding(server, n=200):
+    print("decoding")
+    api = new_api(server)
+    bodies = {
+        "board": api._pool().session().get(server.url + "/v1/board").content,
+        "executions": api._pool().session().get(server.url + "/v1/executions?count=500").content,
+    }
+    for codec_name in CODECS:
+        try:
+            codec = CODECS[codec_name]()
+        except ImportError:
+            continue
+        for name, body in bodies.items():
+            start = time.process_time()
+            for _ in range(n):
+                codec.loads(body)
+            elapsed = time.process_time() - start
+            print("  {:<8} {:<12} {:>9.1f} us CPU ({:,} B)".format(
+                codec_name, name, elapsed / n * 1e6, len(body)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0)
+    args = parser.parse_args()
+    with MockServer(latency=args.latency) as server:
+        bench_throughput(server, args.requests, args.threads)
+        bench_memory(server)
+        bench_signing()
+        bench_decoding(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the bitFlyer HTTP API (and optionally the Realtime API)
+
+    server = MockServer(latency=0.005, error_rate=0.01).start()
+    api = pybitflyer.API(api_key="key", api_secret="secret")
+    api.api_url = server.url
+
+Every endpoint of pybitflyer.API answers with a payload of realistic size:
+a board of `board_depth` levels per side, 500 executions per page, etc.
+Paginated endpoints serve a fixed history in which ids count down from the
+newest, and select pages with count, before and after like the API does.
+Each request waits `latency` seconds (plus up to `jitter`), or the next of
+the seconds queued in `delays` if any, and fails with
+a 500 or 429 with probability `error_rate`; the body of the error is
+`error_page` if set (like the HTML pages of a proxy), or a JSON error.
+Private endpoints answer 401 unless ACCESS-SIGN is the signature, with
+`api_secret`, of the request exactly as received.
+
+The mock also keeps a small account: orders sent with sendchildorder are
+listed by getchildorders (newer than the history) until canceled or filled,
+server.fill() executes them into getexecutions, and getpositions reports
+the net position of the fills.
+"""
+import sys
+import hmac
+import json
+import hashlib
+import time
+import socket
+import random
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# newest ids of the fixed private histories
+EXECUTION_HISTORY = 100000
+ORDER_HISTORY = 1000000
+
+PRODUCTS = ["BTC_JPY", "XRP_JPY", "ETH_JPY", "XLM_JPY", "MONA_JPY", "ETH_BTC",
+            "BCH_BTC", "FX_BTC_JPY"]
+
+
+def make_board(depth=1000, mid=10000000.0):
+    return {
+        "mid_price": mid,
+        "bids": [{"price": mid - 100 - i * 10, "size": round(0.01 + (i % 37) * 0.013, 8)}
+                 for i in range(depth)],
+        "asks": [{"price": mid + 100 + i * 10, "size": round(0.01 + (i % 41) * 0.011, 8)}
+                 for i in range(depth)],
+    }
+
+
+def page_ids(count, before=None, after=None, newest=2500000000):
+    """
+    ids of one page, newest first, selected by count, before and after like the API does
+    """
+    top = newest if before is None else min(newest, before - 1)
+    bottom = max(top - count + 1, 1 if after is None else after + 1)
+    return range(top, bottom - 1, -1)
+
+
+def make_executions(count=500, before=None, mid=10000000.0, after=None):
+    start = datetime(2024, 1, 1)
+    return [{
+        "id": id_,
+        "side": "BUY" if id_ % 2 else "SELL",
+        "price": mid + (id_ % 50) * 5,
+        "size": round(0.001 + (id_ % 17) * 0.007, 8),
+        "exec_date": (start + timedelta(milliseconds=id_ * 7)).isoformat(timespec="milliseconds"),
+        "buy_child_order_acceptance_id": "JRF20240101-000000-%06d" % (2 * (id_ % 500000)),
+        "sell_child_order_acceptance_id": "JRF20240101-000000-%06d" % (2 * (id_ % 500000) + 1),
+    } for id_ in page_ids(count, before, after)]
+
+
+def make_private_executions(count=100, before=None, after=None, newest=EXECUTION_HISTORY):
+    start = datetime(2024, 1, 1)
+    return [{
+        "id": id_, "child_order_id": "JOR20240101-000000-%06d" % id_,
+        "side": "BUY" if id_ % 2 else "SELL", "price": 10000000.0, "size": 0.01,
+        "commission": 0, "exec_date": (start + timedelta(seconds=id_)).isoformat(),
+        "child_order_acceptance_id": "JRF20240101-000000-%06d" % id_,
+    } for id_ in page_ids(count, before, after, newest)]
+
+
+def make_ticker(product_code="BTC_JPY", mid=10000000.0):
+    return {
+        "product_code": product_code, "state": "RUNNING",
+        "timestamp": datetime.utcnow().isoformat(timespec="milliseconds"),
+        "tick_id": random.randint(1, 10 ** 8), "best_bid": mid - 100, "best_ask": mid + 100,
+        "best_bid_size": 0.1, "best_ask_size": 0.2, "total_bid_depth": 1234.5,
+        "total_ask_depth": 2345.6, "market_bid_size": 0, "market_ask_size": 0,
+        "ltp": mid, "volume": 12345.6, "volume_by_product": 2345.6,
+    }
+
+
+def make_child_orders(count=100, product_code="BTC_JPY", before=None, after=None, newest=ORDER_HISTORY):
+    start = datetime(2024, 1, 1)
+    return [{
+        "id": id_, "child_order_id": "JOR20240101-000000-%06d" % id_,
+        "product_code": product_code, "side": "BUY", "child_order_type": "LIMIT",
+        "price": 9000000, "average_price": 9000000, "size": 0.01, "child_order_state": "COMPLETED",
+        "expire_date": "2024-02-01T00:00:00",
+        "child_order_date": (start + timedelta(seconds=id_)).isoformat(),
+        "child_order_acceptance_id": "JRF20240101-000000-%06d" % id_, "outstanding_size": 0,
+        "cancel_size": 0, "executed_size": 0.01, "total_commission": 0,
+    } for id_ in page_ids(count, before, after, newest)]
+
+
+def _page(rows, count, before=None, after=None):
+    # rows newest first, selected like page_ids
+    return [r for r in rows if (before is None or r["id"] < before)
+            and (after is None or r["id"] > after)][:count]
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients that close a connection early (canceled or streamed requests) are not errors
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockServer(object):
+    """
+    Threaded HTTP server implementing the endpoints of pybitflyer.API
+
+    MockServer(host="127.0.0.1", port=0, latency=0, jitter=0, error_rate=0, board_depth=1000,
+               error_page=None, api_secret="secret")
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0, jitter=0, error_rate=0,
+                 board_depth=1000, error_page=None, api_secret="secret"):
+        self.api_secret = api_secret
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_page = error_page
+        self.delays = []
+        self.requests = 0
+        self.board = json.dumps(make_board(board_depth)).encode()
+        self.orders = {}    # acceptance id: order sent to the mock
+        self.fills = []     # executions of those orders, newest first
+        self.position = 0.0
+        self._account = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+            def do_POST(self):
+                server._handle(self)
+
+        self.httpd = _HTTPServer((host, port), Handler)
+        self.url = "http://{}:{}".format(*self.httpd.server_address[:2])
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, handler):
+        self.requests += 1
+        length = int(handler.headers.get("Content-Length") or 0)
+        raw = handler.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else None
+        url = urlsplit(handler.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            time.sleep(self.delays.pop(0))
+        except IndexError:
+            if self.latency or self.jitter:
+                time.sleep(self.latency + random.random() * self.jitter)
+        content_type = "application/json; charset=utf-8"
+        if self.error_rate and random.random() < self.error_rate:
+            status = random.choice([500, 429])
+            if self.error_page is not None:
+                content_type = "text/html"
+                payload = self.error_page
+            else:
+                payload = json.dumps({"status": -1, "error_message": "mock error"}).encode()
+        elif url.path.startswith("/v1/me/") and not self._signed(handler, raw):
+            status = 401
+            payload = json.dumps({"status": -500, "error_message": "Key not found"}).encode()
+        else:
+            status = 200
+            payload = self._payload(url.path, query, body)
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def fill(self, child_order_acceptance_id, size=None):
+        """
+        execute `size` (default: all that is outstanding) of an order sent to the mock
+        """
+        with self._account:
+            order = self.orders[child_order_acceptance_id]
+            size = order["outstanding_size"] if size is None else size
+            execution = {
+                "id": EXECUTION_HISTORY + len(self.fills) + 1,
+                "child_order_id": order["child_order_id"], "side": order["side"],
+                "price": order["price"], "size": size, "commission": 0,
+                "exec_date": datetime.utcnow().isoformat(timespec="milliseconds"),
+                "child_order_acceptance_id": child_order_acceptance_id,
+            }
+            self.fills.insert(0, execution)
+            order["executed_size"] = round(order["executed_size"] + size, 8)
+            order["outstanding_size"] = round(order["outstanding_size"] - size, 8)
+            if order["outstanding_size"] <= 0:
+                order["child_order_state"] = "COMPLETED"
+            self.position = round(self.position + (size if order["side"] == "BUY" else -size), 8)
+            return execution
+
+    def _send_order(self, body):
+        with self._account:
+            id_ = ORDER_HISTORY + len(self.orders) + 1
+            aid = "JRF20240101-%06d" % self.requests
+            self.orders[aid] = dict(
+                body, id=id_, child_order_id="JOR20240101-%06d" % id_, child_order_acceptance_id=aid,
+                child_order_state="ACTIVE", price=body.get("price", 0), average_price=0,
+                child_order_date=datetime.utcnow().isoformat(timespec="seconds"),
+                expire_date=(datetime.utcnow() + timedelta(minutes=body.get("minute_to_expire", 43200))
+                             ).isoformat(timespec="seconds"),
+                outstanding_size=body["size"], executed_size=0.0, cancel_size=0, total_commission=0)
+            return {"child_order_acceptance_id": aid}
+
+    def _cancel_order(self, body):
+        with self._account:
+            order = self.orders.get(body.get("child_order_acceptance_id"))
+            if order is not None and order["child_order_state"] == "ACTIVE":
+                order["child_order_state"] = "CANCELED"
+                order["cancel_size"], order["outstanding_size"] = order["outstanding_size"], 0
+
+    def _child_orders(self, query, count, before, after):
+        aid = query.get("child_order_acceptance_id")
+        state = query.get("child_order_state")
+        with self._account:
+            sent = [dict(o) for o in reversed(list(self.orders.values()))
+                    if aid in (None, o["child_order_acceptance_id"])
+                    and state in (None, o["child_order_state"])]
+        rows = _page(sent, count, before, after)
+        if aid is None and state in (None, "COMPLETED"):
+            rows += make_child_orders(count - len(rows), query.get("product_code", "BTC_JPY"),
+                                      before, after)
+        return rows
+
+    def _executions(self, count, before, after):
+        with self._account:
+            rows = _page(self.fills, count, before, after)
+        return rows + make_private_executions(count - len(rows), before, after)
+
+    def _positions(self):
+        with self._account:
+            if not self.position:
+                return []
+            return [{"product_code": "FX_BTC_JPY", "side": "BUY" if self.position > 0 else "SELL",
+                     "price": 10000000.0, "size": abs(self.position), "commission": 0,
+                     "swap_point_accumulate": 0, "require_collateral": 0,
+                     "open_date": "2024-01-01T00:00:00", "leverage": 2, "pnl": 0, "sfd": 0}]
+
+    def _signed(self, handler, body):
+        # the signature covers the request line's path and the body, byte for byte
+        sign = handler.headers.get("ACCESS-SIGN")
+        timestamp = handler.headers.get("ACCESS-TIMESTAMP")
+        if not sign or not timestamp:
+            return False
+        text = (timestamp + handler.command + handler.path).encode() + body
+        expected = hmac.new(self.api_secret.encode(), text, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(sign, expected)
+
+    def _payload(self, path, query, body):
+        product_code = query.get("product_code", "BTC_JPY")
+        if path == "/v1/board":
+            return self.board
+        if path == "/v1/me/cancelchildorder":
+            self._cancel_order(body or {})
+            return b""
+        if path in ("/v1/me/cancelparentorder", "/v1/me/cancelallchildorders"):
+            return b""
+        count = min(int(query.get("count", 100)), 500)
+        before = int(query["before"]) if "before" in query else None
+        after = int(query["after"]) if "after" in query else None
+        result = {
+            "/v1/markets": [{"product_code": p, "market_type": "Spot"} for p in PRODUCTS],
+            "/v1/ticker": None,
+            "/v1/executions": None,
+            "/v1/gethealth": {"status": "NORMAL"},
+            "/v1/getboardstate": {"health": "NORMAL", "state": "RUNNING"},
+            "/v1/getchats": [],
+            "/v1/me/getpermissions": ["/v1/me/getbalance", "/v1/me/sendchildorder"],
+            "/v1/me/getbalance": [{"currency_code": c, "amount": 1.5, "available": 1.0}
+                                  for c in ("JPY", "BTC", "ETH", "XRP")],
+            "/v1/me/getcollateral": {"collateral": 100000, "open_position_pnl": -10,
+                                     "require_collateral": 5000, "keep_rate": 20.0},
+            "/v1/me/gettradingcommission": {"commission_rate": 0.001},
+            "/v1/me/sendparentorder": {"parent_order_acceptance_id": "JRP20240101-%06d" % self.requests},
+            "/v1/me/getchildorders": None,
+        }.get(path, [])
+        if path == "/v1/ticker":
+            result = make_ticker(product_code)
+        elif path == "/v1/executions":
+            result = make_executions(count, before, after=after)
+        elif path == "/v1/me/getexecutions":
+            result = self._executions(count, before, after)
+        elif path == "/v1/me/getchildorders":
+            result = self._child_orders(query, count, before, after)
+        elif path == "/v1/me/getpositions":
+            result = self._positions()
+        elif path == "/v1/me/sendchildorder":
+            result = self._send_order(body)
+        return json.dumps(result).encode()
+
+
+class MockRealtimeServer(object):
+    """
+    WebSocket server speaking the JSON-RPC protocol of the Realtime API
+
+    MockRealtimeServer(host="127.0.0.1", port=0, interval=0.01)
+
+    Accepts auth, subscribe and unsubscribe, and publishes a ticker, board or
+    executions message on every subscribed channel each `interval` seconds.
+    Requires websockets; run it with `await server.serve()` inside an event loop.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, interval=0.01):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.url = None
+
+    def _message(self, channel):
+        if channel.startswith("lightning_ticker_"):
+            return make_ticker(channel[len("lightning_ticker_"):])
+        if channel.startswith("lightning_executions_"):
+            return make_executions(5)
+        if channel.startswith("lightning_board_"):
+            return make_board(5)
+        return []
+
+    async def _handler(self, ws):
+        channels = set()
+
+        async def publish():
+            while True:
+                await asyncio.sleep(self.interval)
+                for channel in list(channels):
+                    await ws.send(json.dumps({"jsonrpc": "2.0", "method": "channelMessage",
+                                              "params": {"channel": channel,
+                                                         "message": self._message(channel)}}))
+
+        publisher = asyncio.ensure_future(publish())
+        try:
+            async for raw in ws:
+                request = json.loads(raw)
+                if request["method"] == "subscribe":
+                    channels.add(request["params"]["channel"])
+                elif request["method"] == "unsubscribe":
+                    channels.discard(request["params"]["channel"])
+                await ws.send(json.dumps({"jsonrpc": "2.0", "id": request.get("id"), "result": True}))
+        finally:
+            publisher.cancel()
+
+    async def serve(self):
+        """
+        start serving and return the websockets server; self.url is set once listening
+        """
+        import websockets
+        server = await websockets.serve(self._handler, self.host, self.port)
+        port = server.sockets[0].getsockname()[1]
+        self.url = "ws://{}:{}".format(self.host, port)
+        return server
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+    server = MockServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate)
+    print("serving on", server.url)
+    server.httpd.serve_forever()
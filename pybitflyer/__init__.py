@@ -1,3 +1,23 @@
 # -*- coding: utf-8 -*-
 
 from .pybitflyer import API
+from .pool import ConnectionPool
+from .lane import OrderLane
+from .concurrency import ConcurrencyController
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .signer import Signer
+from .cache import ResponseCache
+from .metrics import Metrics
+from .hedge import HedgePolicy
+from .health import HealthMonitor
+from .accounts import AccountPool
+from .pagination import paginate, apaginate
+from .store import ExecutionStore
+from .bars import aggregate, BarAggregator
+from .orderbook import OrderBook
+from .ordermanager import OrderManager
+from .poller import MarketDataPoller
+from . import models
+from .aio import AsyncAPI
+from .realtime import RealtimeAPI
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from .pybitflyer import API
+from .pool import ConnectionPool
+from .ratelimit import RateLimiter
+from .models import field
+
+# API methods that only read account state, so any key of the account may answer
+READ_ONLY_METHODS = frozenset([
+    "getpermissions", "getbalance", "getcollateral", "getcollateralaccounts",
+    "getaddresses", "getcoinins", "getcoinouts", "getbankaccounts", "getdeposits",
+    "getwithdrawals", "getchildorders", "getparentorders", "getparentorder",
+    "getexecutions", "getbalancehistory", "getpositions", "getcollateralhistory",
+    "gettradingcommission",
+])
+
+
+class Account(object):
+    """
+    The API keys of one account
+
+    Read-only methods (getbalance, getpositions, ...) are sent with the key
+    that has the most private budget left; every other method, orders
+    included, with the first key.
+    """
+
+    def __init__(self, name, apis):
+        self.name = name
+        self.apis = apis
+
+    @property
+    def primary(self):
+        return self.apis[0]
+
+    def route(self):
+        """
+        return the API of the key with the most private budget left
+        """
+        if len(self.apis) == 1:
+            return self.apis[0]
+        return max(self.apis, key=lambda api: api.rate_limiter.remaining().get("private", float("inf")))
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "apis":
+            raise AttributeError(name)
+        if name in READ_ONLY_METHODS:
+            return getattr(self.route(), name)
+        return getattr(self.primary, name)
+
+
+class AccountPool(object):
+    """
+    API keys of several accounts sharing one connection pool
+
+    AccountPool(accounts, pool=None, rate_limiter=None, max_workers=10, **options)
+
+    Every key has its own private and order budgets and all keys share the
+    per-IP budget, so requests of one account never wait for another's
+    budget while the pool as a whole stays within the exchange's IP limit.
+
+        accounts = pybitflyer.AccountPool({
+            "main": [("key1", "secret1"), ("key2", "secret2")],
+            "sub": ("key3", "secret3"),
+        })
+        accounts["main"].getpositions(product_code="FX_BTC_JPY")
+        accounts.total_collateral()
+
+    Parameters:
+        - accounts -- dict of account name to an (api_key, api_secret) pair or
+                      a list of pairs of the same account
+        - pool -- ConnectionPool of all keys (default: the shared pool)
+        - rate_limiter -- RateLimiter whose budgets each key gets a copy of
+                          (default: RateLimiter())
+        - max_workers -- threads fetching the accounts of aggregated views
+        - options -- other keyword arguments of API (timeout, retry, metrics, ...)
+    """
+
+    def __init__(self, accounts, pool=None, rate_limiter=None, max_workers=10, **options):
+        self.pool = pool or ConnectionPool.shared()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_workers = max_workers
+        self.accounts = {}
+        for name, keys in accounts.items():
+            if isinstance(keys, tuple):
+                keys = [keys]
+            self.accounts[name] = Account(name, [
+                API(api_key, api_secret, pool=self.pool, rate_limiter=self.rate_limiter.derive(),
+                    **options)
+                for api_key, api_secret in keys])
+
+    def __getitem__(self, name):
+        return self.accounts[name]
+
+    def __iter__(self):
+        return iter(self.accounts.values())
+
+    def remaining(self):
+        """
+        return {account: [budgets of each key]}, see RateLimiter.remaining()
+        """
+        return dict((name, [api.rate_limiter.remaining() for api in account.apis])
+                    for name, account in self.accounts.items())
+
+    def gather(self, method, accounts=None, **params):
+        """
+        call `method` (e.g. "getbalance") on every account in parallel
+
+        Returns {account: response}; an account whose call raised maps to the exception.
+        """
+        names = list(self.accounts) if accounts is None else list(accounts)
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as executor:
+            futures = [(name, executor.submit(getattr(self.accounts[name], method), **params))
+                       for name in names]
+        return dict((name, f.exception() if f.exception() is not None else f.result())
+                    for name, f in futures)
+
+    @staticmethod
+    def _raise_first(results):
+        for result in results.values():
+            if isinstance(result, Exception):
+                raise result
+
+    def total_collateral(self, accounts=None):
+        """
+        return the sum of getcollateral of the accounts: collateral, open_position_pnl,
+        require_collateral and keep_rate ((collateral + open_position_pnl) / require_collateral)
+        """
+        results = self.gather("getcollateral", accounts)
+        self._raise_first(results)
+        total = {"collateral": 0.0, "open_position_pnl": 0.0, "require_collateral": 0.0}
+        for collateral in results.values():
+            for key in total:
+                total[key] += field(collateral, key) or 0.0
+        equity = total["collateral"] + total["open_position_pnl"]
+        total["keep_rate"] = equity / total["require_collateral"] if total["require_collateral"] else 0.0
+        return total
+
+    def total_balance(self, accounts=None):
+        """
+        return {currency_code: {"amount": n, "available": n}} summed over the accounts
+        """
+        results = self.gather("getbalance", accounts)
+        self._raise_first(results)
+        total = defaultdict(lambda: {"amount": 0.0, "available": 0.0})
+        for balances in results.values():
+            for balance in balances:
+                currency = total[field(balance, "currency_code")]
+                currency["amount"] += field(balance, "amount")
+                currency["available"] += field(balance, "available")
+        return dict(total)
+
+    def total_position(self, product_code, accounts=None):
+        """
+        return the net open position of the accounts in `product_code` (BUY positive)
+        """
+        results = self.gather("getpositions", accounts, product_code=product_code)
+        self._raise_first(results)
+        return round(sum(field(p, "size") if field(p, "side") == "BUY" else -field(p, "size")
+                         for positions in results.values() for p in positions), 8)
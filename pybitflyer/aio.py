@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import asyncio
+from .exception import APIException, DeadlineExceeded
+from . import models
+from .pybitflyer import API, _Deadline, _deadline, _endpoint
+from .stream import aiter_rows, aiter_board
+
+
+class AsyncAPI(API):
+    """
+    asyncio Python API for bitFlyer
+
+    AsyncAPI(api_key=None, api_secret=None, timeout=None,
+             lock=None, logger=None, retry=0, limit=100, typed=False,
+             codec=None, metrics=None)
+
+    Every endpoint method of API, as well as send_orders and cancel_orders,
+    is available and returns a coroutine; executions_stream and board_stream
+    return async iterators:
+
+        async with AsyncAPI() as api:
+            board, ticker = await asyncio.gather(
+                api.board(product_code="BTC_JPY"),
+                api.ticker(product_code="BTC_JPY"))
+            async for execution in api.executions_stream(product_code="BTC_JPY"):
+                ...
+
+    Requires aiohttp.
+
+    Parameters:
+        - api_key -- api key
+        - api_secret -- api secret
+        - timeout -- connect and read timeout in seconds, or a (connect, read) tuple
+        - lock -- asyncio.Lock held around every request (default: None)
+        - logger -- logger used to report request and decode errors
+        - retry -- number of retries, or a RetryPolicy (default: 0)
+        - limit -- maximum number of pooled keep-alive connections
+        - typed -- whether to return models from pybitflyer.models (default: False)
+        - codec -- JSON codec or its name (default: the fastest installed one)
+        - metrics -- Metrics recording every request (default: None)
+    """
+
+    def __init__(self, api_key=None, api_secret=None, timeout=None,
+                 lock=None, logger=None, retry=0, limit=100, typed=False,
+                 codec=None, metrics=None):
+        self.limit = limit
+        super().__init__(api_key=api_key, api_secret=api_secret,
+                         keep_session=False, timeout=timeout,
+                         lock=lock, logger=logger, retry=retry, typed=typed,
+                         codec=codec, metrics=metrics)
+
+    def _new_lock(self):
+        return asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _new_session(self):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("AsyncAPI requires aiohttp: pip install aiohttp")
+
+        # like requests, a single number bounds the connect and each read, not the whole request
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        connector = aiohttp.TCPConnector(limit=self.limit)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     cookie_jar=aiohttp.DummyCookieJar())
+
+    async def close(self):
+        """
+        close HTTP session and its connection pool
+        """
+        if self.sess:
+            await self.sess.close()
+            self.sess = None
+
+    async def _request(self, endpoint, method="GET", params=None):
+        # the lock is held for each attempt, not during backoffs
+        policy = self.retry
+        begin = time.monotonic()
+        attempt = 0
+        delay = None
+        while True:
+            try:
+                if self.lock is None:
+                    status, headers, content = await self.__request(endpoint, method, params,
+                                                                    begin, attempt)
+                else:
+                    await self.__acquire(endpoint, begin)
+                    try:
+                        status, headers, content = await self.__request(endpoint, method, params,
+                                                                        begin, attempt)
+                    finally:
+                        self.lock.release()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if policy.should_retry(endpoint, method, attempt, error=e):
+                    delay = policy.backoff(delay)
+                    if await self.__sleep(policy, begin, delay):
+                        attempt += 1
+                        continue
+                raise
+            if status != 200 and policy.should_retry(endpoint, method, attempt, status, content):
+                delay = policy.backoff(delay, headers)
+                if await self.__sleep(policy, begin, delay):
+                    attempt += 1
+                    continue
+            break
+
+        if status != 200:
+            raise APIException(endpoint, method, status, content, params)
+
+        if self.typed:
+            return models.convert(endpoint, content)
+        return content
+
+    async def __acquire(self, endpoint, begin):
+        # the wait for the lock ends at the retry deadline
+        remaining = self.retry.remaining(begin)
+        if remaining is None:
+            await self.lock.acquire()
+            return
+        try:
+            await asyncio.wait_for(self.lock.acquire(), max(remaining, 0.0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(endpoint) from None
+
+    async def __send(self, endpoint, method, params, remaining, stream=False):
+        if self.sess is None:
+            self.sess = self._new_session()
+        from yarl import URL
+        path, body, header = self._prepare(endpoint, method, params)
+        # sent as signed: aiohttp would otherwise normalize the quoting of the query
+        url = URL(self.api_url + path, encoded=True)
+        kwargs = {} if remaining is None else {"timeout": self._client_timeout(endpoint, remaining, stream)}
+        deadline = _deadline.get()
+        if deadline is not None:
+            deadline.send(endpoint)
+        try:
+            if method == "GET":
+                response = await self.sess.get(url, headers=header, **kwargs)
+            else:  # method == "POST":
+                response = await self.sess.post(url, data=body, headers=header, **kwargs)
+            # when the headers arrived, as response.elapsed of requests
+            received = time.perf_counter()
+            return response, received, None if stream else await response.read()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if self.logger:
+                self.logger.error("Error: {}".format(sys.exc_info()[0]))
+            raise
+
+    def __error_body(self, content):
+        try:
+            return self.codec.loads(content) if content else None
+        except ValueError:
+            return None
+
+    def _client_timeout(self, endpoint, remaining, stream=False):
+        import aiohttp
+        timeout = self._timeout(endpoint, remaining)
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        # like API, a stream bounds each read, not the whole download
+        return aiohttp.ClientTimeout(total=None if stream else remaining,
+                                     sock_connect=connect, sock_read=read)
+
+    async def __sleep(self, policy, begin, delay):
+        remaining = policy.remaining(begin)
+        if remaining is not None and delay >= remaining:
+            return False
+        deadline = _deadline.get()
+        if deadline is not None and delay >= deadline.remaining():
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    async def __request(self, endpoint, method, params, begin, attempt):
+        # one attempt; returns the status, headers and decoded content
+        metrics = self.metrics
+        if metrics is None:
+            response, _, body = await self.__send(endpoint, method, params, self.retry.remaining(begin))
+        else:
+            start = time.perf_counter()
+            try:
+                response, received, body = await self.__send(endpoint, method, params,
+                                                             self.retry.remaining(begin))
+            except Exception as e:
+                metrics.record_error(endpoint, method, e)
+                raise
+            read = time.perf_counter()
+
+        if response.status != 200:
+            # error pages need not be JSON
+            content = self.__error_body(body)
+        else:
+            content = ""
+            if len(body) > 0:
+                try:
+                    content = self.codec.loads(body)
+                except ValueError:
+                    if self.logger:
+                        self.logger.error("JSON Decode Error: {}".format(body))
+                    if metrics is not None:
+                        metrics.record_error(endpoint, method, sys.exc_info()[1])
+                    raise
+
+        if metrics is not None:
+            end = time.perf_counter()
+            metrics.record(endpoint, method, response.status, {
+                "wait": received - start,
+                "transfer": read - received,
+                "decode": end - read,
+                "total": end - start,
+            }, 1 if attempt else 0)
+        return response.status, response.headers, content
+
+    def executions_stream(self, **params):
+        """Execution History, Streamed
+
+        Async iterator of the executions, as API.executions_stream.
+        """
+        return self._stream("/v1/executions", params, aiter_rows)
+
+    def board_stream(self, **params):
+        """Order Book, Streamed
+
+        Async iterator of the board items, as API.board_stream.
+        """
+        return self._stream("/v1/board", params, aiter_board)
+
+    async def _stream(self, endpoint, params, parse):
+        # retried like _request until rows start to arrive; the lock is held
+        # until the iterator is exhausted or closed
+        policy = self.retry
+        begin = time.monotonic()
+        attempt = 0
+        delay = None
+        while True:
+            if self.lock is not None:
+                await self.__acquire(endpoint, begin)
+            try:
+                start = time.perf_counter()
+                response, received, content, error = await self.__open_stream(endpoint, params, begin,
+                                                                              attempt, start)
+                if response is not None and response.status == 200:
+                    async for item in self.__read_stream(endpoint, response, parse, attempt,
+                                                         start, received):
+                        yield item
+                    return
+            finally:
+                if self.lock is not None:
+                    self.lock.release()
+            if error is not None:
+                if policy.should_retry(endpoint, "GET", attempt, error=error):
+                    delay = policy.backoff(delay)
+                    if await self.__sleep(policy, begin, delay):
+                        attempt += 1
+                        continue
+                raise error
+            if policy.should_retry(endpoint, "GET", attempt, response.status, content):
+                delay = policy.backoff(delay, response.headers)
+                if await self.__sleep(policy, begin, delay):
+                    attempt += 1
+                    continue
+            raise APIException(endpoint, "GET", response.status, content, params)
+
+    async def __open_stream(self, endpoint, params, begin, attempt, start):
+        # return (response, time of its headers, error content, exception) of one attempt
+        metrics = self.metrics
+        try:
+            response, received, _ = await self.__send(endpoint, "GET", params,
+                                                      self.retry.remaining(begin), stream=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if metrics is not None:
+                metrics.record_error(endpoint, "GET", e)
+            return None, None, None, e
+        if response.status == 200:
+            return response, received, None, None
+        try:
+            content = self.__error_body(await response.read())
+        finally:
+            response.release()
+            if metrics is not None:
+                end = time.perf_counter()
+                metrics.record(endpoint, "GET", response.status,
+                               {"wait": received - start, "transfer": end - received,
+                                "total": end - start}, 1 if attempt else 0)
+        return response, received, content, None
+
+    async def __read_stream(self, endpoint, response, parse, attempt, start, received):
+        metrics = self.metrics
+        try:
+            # aiohttp unzips gzip as it arrives
+            async for item in parse(response.content.iter_chunked(65536)):
+                yield item
+        finally:
+            # the connection is closed unless the body was read to its end
+            response.release()
+            if metrics is not None:
+                end = time.perf_counter()
+                metrics.record(endpoint, "GET", response.status,
+                               {"wait": received - start, "transfer": end - received,
+                                "total": end - start}, 1 if attempt else 0)
+
+    async def _batch(self, calls, deadline, max_workers):
+        if not calls:
+            return []
+        semaphore = asyncio.Semaphore(max_workers)
+        at = None if deadline is None else time.monotonic() + deadline
+        deadlines = [None if at is None else _Deadline(at) for _ in calls]
+
+        async def call(method, params, deadline):
+            # each task runs in its own context
+            _deadline.set(deadline)
+            async with semaphore:
+                return await method(**params)
+
+        tasks = [asyncio.ensure_future(call(method, params, d))
+                 for (method, params), d in zip(calls, deadlines)]
+        await asyncio.wait(tasks, timeout=deadline)
+        results = []
+        for (method, _), task, d in zip(calls, tasks, deadlines):
+            if not task.done():
+                task.cancel()
+                results.append(DeadlineExceeded(_endpoint(method), d.expire()))
+            elif task.exception() is not None:
+                results.append(task.exception())
+            else:
+                results.append(task.result())
+        return results
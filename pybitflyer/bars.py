@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+from .models import ExecutionList
+from .store import SIDES, executions_to_columns
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+BAR_COLUMNS = ("time", "open", "high", "low", "close", "volume", "vwap", "count",
+               "buy_volume", "sell_volume")
+
+
+def execution_columns(executions):
+    """
+    return executions as a dict of NumPy arrays (see store.COLUMNS) in ascending id order
+
+    `executions` may be such a dict (e.g. ExecutionStore.range()), an
+    ExecutionList, or an iterable of dicts or Execution models, like a page
+    of API.executions or a paginator.
+    """
+    if isinstance(executions, dict):
+        columns = dict((name, np.asarray(executions[name]))
+                       for name in ("id", "exec_date", "price", "size", "side"))
+    elif isinstance(executions, ExecutionList):
+        columns = {
+            "id": np.frombuffer(executions.id, dtype="<i8"),
+            "exec_date": np.array([d.rstrip("Z") for d in executions.exec_date],
+                                  dtype="datetime64[ms]").astype("<i8"),
+            "price": np.frombuffer(executions.price, dtype="<f8"),
+            "size": np.frombuffer(executions.size, dtype="<f8"),
+            "side": np.array([SIDES.get(s, 0) for s in executions.side], dtype="i1"),
+        }
+    else:
+        return executions_to_columns(list(executions))
+    ids = columns["id"]
+    if len(ids) > 1 and not (ids[1:] > ids[:-1]).all():
+        order = np.argsort(ids, kind="stable")
+        columns = dict((name, column[order]) for name, column in columns.items())
+    return columns
+
+
+def aggregate(executions, interval):
+    """
+    return OHLCV bars of `executions` as a dict of NumPy arrays
+
+    Bars are `interval` seconds long and aligned to the epoch; intervals
+    without executions have no bar. The columns are time (bar start in
+    milliseconds since the epoch), open, high, low, close, volume, vwap,
+    count, buy_volume and sell_volume.
+
+    Requires numpy.
+    """
+    if np is None:
+        raise ImportError("aggregate requires numpy: pip install numpy")
+    columns = execution_columns(executions)
+    return _aggregate(columns, int(interval * 1000))
+
+
+def _aggregate(columns, interval_ms):
+    exec_date = columns["exec_date"]
+    if len(exec_date) == 0:
+        return _empty()
+    price = columns["price"].astype("<f8", copy=False)
+    size = columns["size"].astype("<f8", copy=False)
+    side = columns["side"]
+    bucket = exec_date // interval_ms
+    starts = np.concatenate(([0], np.flatnonzero(bucket[1:] != bucket[:-1]) + 1))
+    ends = np.append(starts[1:], len(price))
+    volume = np.add.reduceat(size, starts)
+    buy_volume = np.add.reduceat(np.where(side > 0, size, 0.0), starts)
+    sell_volume = np.add.reduceat(np.where(side < 0, size, 0.0), starts)
+    notional = np.add.reduceat(price * size, starts)
+    return {
+        "time": bucket[starts] * interval_ms,
+        "open": price[starts],
+        "high": np.maximum.reduceat(price, starts),
+        "low": np.minimum.reduceat(price, starts),
+        "close": price[ends - 1],
+        "volume": volume,
+        "vwap": notional / np.where(volume > 0, volume, 1.0),
+        "count": ends - starts,
+        "buy_volume": buy_volume,
+        "sell_volume": sell_volume,
+    }
+
+
+def _empty():
+    return dict((name, np.empty(0, dtype="<i8" if name in ("time", "count") else "<f8"))
+                for name in BAR_COLUMNS)
+
+
+class BarAggregator(object):
+    """
+    Incrementally updated OHLCV bars
+
+    BarAggregator(interval)
+
+    update() accepts executions in any form that aggregate() does. Only
+    executions with an id above the last one seen are used, so overlapping
+    pages can be passed as they come. New executions are aggregated on their
+    own and merged into the last bar, so earlier bars are never recomputed.
+    The last bar stays open until an execution of a later interval arrives.
+
+        bars = BarAggregator(60)
+        bars.update(paginate(api.executions, product_code="BTC_JPY", since=start))
+        bars.update(api.executions(product_code="BTC_JPY"))
+        bars.bars()["close"]
+
+    Requires numpy.
+
+    Parameters:
+        - interval -- bar length in seconds
+    """
+
+    def __init__(self, interval):
+        if np is None:
+            raise ImportError("BarAggregator requires numpy: pip install numpy")
+        self.interval = interval
+        self.interval_ms = int(interval * 1000)
+        self.last_id = None
+        self._chunks = []
+        self._last = None
+        self._bars = None
+
+    def update(self, executions):
+        """
+        add executions; return the number of executions used
+        """
+        columns = execution_columns(executions)
+        if self.last_id is not None:
+            keep = columns["id"] > self.last_id
+            if not keep.all():
+                columns = dict((name, column[keep]) for name, column in columns.items())
+        n = len(columns["id"])
+        if n == 0:
+            return 0
+        self.last_id = int(columns["id"][-1])
+        new = _aggregate(columns, self.interval_ms)
+        last = self._last
+        if last is not None and last["time"][0] == new["time"][0]:
+            self._merge(last, new)
+        elif last is not None:
+            self._chunks.append(last)
+        if len(new["time"]) > 1:
+            self._chunks.append(dict((name, column[:-1]) for name, column in new.items()))
+        self._last = dict((name, column[-1:].copy()) for name, column in new.items())
+        self._bars = None
+        return n
+
+    @staticmethod
+    def _merge(last, new):
+        # fold the open bar into the first new bar, in place
+        volume = last["volume"][0] + new["volume"][0]
+        notional = last["vwap"][0] * last["volume"][0] + new["vwap"][0] * new["volume"][0]
+        new["open"][0] = last["open"][0]
+        new["high"][0] = max(last["high"][0], new["high"][0])
+        new["low"][0] = min(last["low"][0], new["low"][0])
+        new["vwap"][0] = notional / volume if volume > 0 else new["vwap"][0]
+        new["volume"][0] = volume
+        new["count"][0] += last["count"][0]
+        new["buy_volume"][0] += last["buy_volume"][0]
+        new["sell_volume"][0] += last["sell_volume"][0]
+
+    def bars(self):
+        """
+        return all bars, the open one last, as a dict of NumPy arrays
+        """
+        if self._bars is None:
+            chunks = self._chunks + ([self._last] if self._last is not None else [])
+            if not chunks:
+                return _empty()
+            self._bars = dict((name, np.concatenate([c[name] for c in chunks])) for name in BAR_COLUMNS)
+            # keep one chunk, so that repeated updates do not concatenate everything again
+            self._chunks = [dict((name, column[:-1]) for name, column in self._bars.items())] \
+                if self._last is not None else [self._bars]
+        return self._bars
+
+    def last(self):
+        """
+        return the open bar as a dict of scalars, or None
+        """
+        if self._last is None:
+            return None
+        return dict((name, column[0].item()) for name, column in self._last.items())
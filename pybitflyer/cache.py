@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import copy
+import time
+from collections import OrderedDict
+from threading import Lock, Event
+from .pybitflyer import _body_crc
+
+DEFAULT_TTLS = {
+    "/v1/markets": 300,
+    "/v1/getboardstate": 1,
+    "/v1/me/getpermissions": 300,
+    "/v1/me/gettradingcommission": 60,
+    "/v1/me/getaddresses": 300,
+    "/v1/me/getbankaccounts": 300,
+}
+
+
+class _Flight(object):
+    __slots__ = ("event", "value", "error", "crc")
+
+    def __init__(self):
+        self.event = Event()
+        self.value = None
+        self.error = None
+        self.crc = None
+
+
+def _report(crc):
+    # a cached response reports the crc32 of its body like a fetched one (see MarketDataPoller)
+    crcs = _body_crc.get()
+    if crcs is not None and crc is not None:
+        crcs.append(crc)
+
+
+class ResponseCache(object):
+    """
+    TTL cache of GET responses for slow-changing endpoints
+
+    ResponseCache(ttls=None, maxsize=256)
+
+    Identical requests that arrive while one is in flight wait for its
+    response instead of sending their own (single flight). Responses are
+    copied on the way out, so callers may modify them.
+
+    Parameters:
+        - ttls -- dict of endpoint to seconds, merged into DEFAULT_TTLS
+                  (markets, getboardstate, getpermissions, gettradingcommission,
+                  getaddresses, getbankaccounts). A ttl of None or 0 disables
+                  caching of that endpoint.
+        - maxsize -- maximum number of cached responses; the least recently
+                     used are evicted first.
+    """
+
+    def __init__(self, ttls=None, maxsize=256):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generation = 0
+        self._lock = Lock()
+
+    def __reduce__(self):
+        # responses are not carried over
+        return ResponseCache, (self.ttls, self.maxsize)
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint)
+
+    @staticmethod
+    def key(api_key, endpoint, params):
+        return api_key, endpoint, tuple(sorted((params or {}).items()))
+
+    def get(self, key, fetch):
+        """
+        return the cached response for key, or call fetch() once for all concurrent callers
+        """
+        endpoint = key[1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                _report(entry[2])
+                return copy.deepcopy(entry[1])
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                generation = self._generation
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            _report(flight.crc)
+            return copy.deepcopy(flight.value)
+
+        crcs = []
+        token = _body_crc.set(crcs)
+        try:
+            flight.value = fetch()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            _body_crc.reset(token)
+            flight.crc = crcs[0] if crcs else None
+            with self._lock:
+                del self._inflight[key]
+                if flight.error is None and generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttls[endpoint], flight.value,
+                                          flight.crc)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+            flight.event.set()
+        _report(flight.crc)
+        return copy.deepcopy(flight.value)
+
+    def invalidate(self, endpoint=None):
+        """
+        drop cached responses of `endpoint`, or all of them
+        """
+        with self._lock:
+            self._generation += 1
+            if endpoint is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[1] == endpoint]:
+                    del self._entries[key]
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import json
+
+
+class JSONCodec(object):
+    """
+    JSON codec based on the standard library
+
+    Codecs encode request bodies to bytes and decode response bodies from
+    bytes. Decode errors are raised as ValueError subclasses.
+    """
+
+    name = "json"
+
+    def __reduce__(self):
+        return get_codec, (self.name,)
+
+    def dumps(self, obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self.dumps = orjson.dumps
+        self.loads = orjson.loads
+
+
+class UjsonCodec(JSONCodec):
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+        self.loads = ujson.loads
+
+    def dumps(self, obj):
+        return self._ujson.dumps(obj).encode("utf-8")
+
+
+CODECS = {
+    "orjson": OrjsonCodec,
+    "ujson": UjsonCodec,
+    "json": JSONCodec,
+}
+
+
+def get_codec(name=None):
+    """
+    return a codec by name ("orjson", "ujson" or "json")
+
+    Without a name, the fastest installed library is used: orjson, then ujson,
+    then the standard library.
+    """
+    if name is not None:
+        return CODECS[name]()
+    for cls in (OrjsonCodec, UjsonCodec):
+        try:
+            return cls()
+        except ImportError:
+            pass
+    return JSONCodec()
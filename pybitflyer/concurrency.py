@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import time
+import heapq
+import itertools
+from contextlib import contextmanager
+from threading import Condition
+from .endpoints import PUBLIC, PRIVATE, ORDER, CANCEL_ENDPOINTS, ORDER_ENDPOINTS, category
+from .exception import DeadlineExceeded
+
+
+class PrioritySemaphore(object):
+    """
+    Semaphore whose waiters are woken by priority (lower first), then FIFO
+
+    PrioritySemaphore(value=1)
+    """
+
+    def __init__(self, value=1):
+        self.limit = value
+        self._value = value
+        self._cond = Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def acquire(self, priority=0, timeout=None):
+        with self._cond:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return True
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not (self._value > 0 and self._waiters[0] == entry):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiters)
+            self._value -= 1
+            if self._value > 0 and self._waiters:
+                self._cond.notify_all()
+            return True
+
+    def release(self):
+        with self._cond:
+            self._value += 1
+            self._cond.notify_all()
+
+    def resize(self, value):
+        """
+        change the number of slots; holders above a lower limit finish normally
+        """
+        with self._cond:
+            self._value += value - self.limit
+            self.limit = value
+            self._cond.notify_all()
+
+
+class ConcurrencyController(object):
+    """
+    Per-endpoint and per-category limits on requests in flight
+
+    ConcurrencyController(limits=None, endpoint_limits=None, total=None)
+
+    Requests wait only for slots of their own endpoint and category, so a slow
+    getexecutions does not block a cancelchildorder. When slots are contended,
+    cancels are served first, then new orders, then everything else.
+
+    Parameters:
+        - limits -- dict of category ("public", "private", "order") to the
+                    maximum number of concurrent requests (default: public 10,
+                    private 5, order 5). None means unlimited.
+        - endpoint_limits -- dict of endpoint (e.g. "/v1/me/getexecutions") to
+                             the maximum number of concurrent requests.
+        - total -- maximum number of concurrent requests across all endpoints
+                   (default: None, unlimited).
+    """
+
+    default_limits = {PUBLIC: 10, PRIVATE: 5, ORDER: 5}
+
+    CANCEL_PRIORITY = 0
+    ORDER_PRIORITY = 1
+    READ_PRIORITY = 2
+
+    def __init__(self, limits=None, endpoint_limits=None, total=None):
+        limits = dict(self.default_limits, **(limits or {}))
+        self.limits = limits
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.total = total
+        self._categories = {c: PrioritySemaphore(n) for c, n in limits.items() if n is not None}
+        self._endpoints = {e: PrioritySemaphore(n) for e, n in self.endpoint_limits.items()}
+        self._total = PrioritySemaphore(total) if total is not None else None
+
+    def scale(self, factor):
+        """
+        resize every limit to `factor` times its configured value (at least 1)
+        """
+        semaphores = ([(s, self.limits[c]) for c, s in self._categories.items()] +
+                      [(s, self.endpoint_limits[e]) for e, s in self._endpoints.items()])
+        if self._total is not None:
+            semaphores.append((self._total, self.total))
+        for s, limit in semaphores:
+            s.resize(max(int(round(limit * factor)), 1))
+
+    def __reduce__(self):
+        return ConcurrencyController, (self.limits, self.endpoint_limits, self.total)
+
+    def priority(self, endpoint):
+        if endpoint in CANCEL_ENDPOINTS:
+            return self.CANCEL_PRIORITY
+        if endpoint in ORDER_ENDPOINTS:
+            return self.ORDER_PRIORITY
+        return self.READ_PRIORITY
+
+    @contextmanager
+    def slot(self, endpoint, timeout=None):
+        """
+        hold a slot for one request to `endpoint`
+
+        Raises DeadlineExceeded when no slot frees up within `timeout` seconds.
+        """
+        priority = self.priority(endpoint)
+        semaphores = [s for s in (self._endpoints.get(endpoint),
+                                  self._categories.get(category(endpoint)),
+                                  self._total) if s is not None]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        acquired = []
+        try:
+            for s in semaphores:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                if not s.acquire(priority, remaining):
+                    raise DeadlineExceeded(endpoint)
+                acquired.append(s)
+            yield
+        finally:
+            for s in reversed(acquired):
+                s.release()
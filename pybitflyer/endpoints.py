@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+PUBLIC = "public"
+PRIVATE = "private"
+ORDER = "order"
+
+ORDER_ENDPOINTS = frozenset([
+    "/v1/me/sendchildorder",
+    "/v1/me/sendparentorder",
+])
+
+CANCEL_ENDPOINTS = frozenset([
+    "/v1/me/cancelchildorder",
+    "/v1/me/cancelparentorder",
+    "/v1/me/cancelallchildorders",
+])
+
+
+def category(endpoint):
+    """
+    classify an endpoint as PUBLIC, PRIVATE (read or account) or ORDER (placement and cancel)
+    """
+    if endpoint in ORDER_ENDPOINTS or endpoint in CANCEL_ENDPOINTS:
+        return ORDER
+    if endpoint.startswith("/v1/me/"):
+        return PRIVATE
+    return PUBLIC
@@ -16,3 +16,31 @@ class APIException(Exception):
         self.params      = params
         msg = f'API error occured. {method} {endpoint} {status_code} response={response}, params={params}'
         super().__init__(msg)
+
+
+class RateLimitException(Exception):
+    def __init__(self, endpoint, budget, retry_after):
+        self.endpoint    = endpoint
+        self.budget      = budget
+        self.retry_after = retry_after
+        msg = f'Rate limit exceeded. {endpoint} budget={budget}, retry_after={retry_after:.3f}s'
+        super().__init__(msg)
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, endpoint, sent=False):
+        self.endpoint    = endpoint
+        self.sent        = sent
+        if sent:
+            msg = f'Deadline exceeded while the request was in flight. {endpoint}'
+        else:
+            msg = f'Deadline exceeded before the request was sent. {endpoint}'
+        super().__init__(msg)
+
+
+class ExchangeUnavailableException(Exception):
+    def __init__(self, endpoint, health):
+        self.endpoint    = endpoint
+        self.health      = health
+        msg = f'Exchange is not accepting orders. {endpoint} health={health}'
+        super().__init__(msg)
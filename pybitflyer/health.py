@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+from threading import Condition, Thread, Event
+from .endpoints import ORDER_ENDPOINTS
+from .exception import ExchangeUnavailableException
+from .models import field
+
+# health levels reported by gethealth and getboardstate, from best to worst
+LEVELS = ("NORMAL", "BUSY", "VERY BUSY", "SUPER BUSY", "NO ORDER", "STOP")
+
+# levels in which the exchange does not accept new orders
+CLOSED_LEVELS = frozenset(["NO ORDER", "STOP"])
+
+# level: (concurrency factor, timeout factor, interval factor)
+DEFAULT_PROFILES = {
+    "NORMAL": (1, 1, 1),
+    "BUSY": (0.75, 1.5, 1.5),
+    "VERY BUSY": (0.5, 2, 2),
+    "SUPER BUSY": (0.25, 3, 4),
+    "NO ORDER": (0.25, 3, 4),
+    "STOP": (0.1, 3, 10),
+}
+
+
+class HealthMonitor(object):
+    """
+    Adaptive throttling driven by the exchange's health
+
+    HealthMonitor(product_code="BTC_JPY", interval=5, profiles=None, block=True,
+                  order_timeout=None)
+
+    The monitor polls getboardstate in a background thread and, for each
+    health level, scales the API it is attached to:
+
+        - the limits of API.concurrency
+        - request timeouts (API.timeout times the timeout factor)
+        - polling intervals of OrderManager and of callers that use
+          scale_interval()
+
+    While the health is NO ORDER or STOP, sendchildorder and sendparentorder
+    wait until orders are accepted again, or raise
+    ExchangeUnavailableException when block is False. Cancels are never held.
+
+        monitor = pybitflyer.HealthMonitor(product_code="FX_BTC_JPY")
+        api = pybitflyer.API(api_key, api_secret, concurrency=controller, health=monitor)
+        monitor.start()
+
+    Parameters:
+        - product_code -- product whose board state is polled
+        - interval -- seconds between polls at NORMAL; scaled like other intervals
+        - profiles -- dict of level to (concurrency, timeout, interval) factors,
+                      merged into DEFAULT_PROFILES
+        - block -- whether orders wait while the exchange does not accept them
+                   (default: True) instead of raising
+        - order_timeout -- maximum seconds an order waits, then
+                           ExchangeUnavailableException is raised (default: None)
+    """
+
+    def __init__(self, product_code="BTC_JPY", interval=5, profiles=None, block=True,
+                 order_timeout=None):
+        self.product_code = product_code
+        self.interval = interval
+        self.profiles = dict(DEFAULT_PROFILES, **(profiles or {}))
+        self.block = block
+        self.order_timeout = order_timeout
+        self.api = None
+        self.health = "NORMAL"
+        self.state = None
+        self.updated = None
+        self._cond = Condition()
+        self._stop = Event()
+        self._thread = None
+
+    def __reduce__(self):
+        # the copy is not started; the API it is unpickled with attaches itself
+        return HealthMonitor, (self.product_code, self.interval, self.profiles, self.block,
+                               self.order_timeout)
+
+    def attach(self, api):
+        self.api = api
+
+    @property
+    def accepts_orders(self):
+        return self.health not in CLOSED_LEVELS
+
+    def _factors(self):
+        return self.profiles.get(self.health, DEFAULT_PROFILES["NORMAL"])
+
+    def scale_timeout(self, timeout):
+        """
+        return `timeout` (seconds, (connect, read) tuple or None) widened for the current health
+        """
+        if timeout is None:
+            return None
+        factor = self._factors()[1]
+        if isinstance(timeout, tuple):
+            return tuple(None if t is None else t * factor for t in timeout)
+        return timeout * factor
+
+    def scale_interval(self, interval):
+        """
+        return a polling `interval` in seconds stretched for the current health
+        """
+        return interval * self._factors()[2]
+
+    def update(self, health, state=None):
+        """
+        apply a health level, e.g. one received from the realtime API
+        """
+        with self._cond:
+            changed = health != self.health
+            self.health = health
+            self.state = state
+            self.updated = time.monotonic()
+            if self.accepts_orders:
+                self._cond.notify_all()
+        if changed and self.api is not None and self.api.concurrency is not None:
+            self.api.concurrency.scale(self._factors()[0])
+
+    def poll(self):
+        """
+        read the board state of product_code and apply its health
+        """
+        board_state = self.api.getboardstate(product_code=self.product_code)
+        self.update(field(board_state, "health"), field(board_state, "state"))
+
+    def check(self, endpoint, timeout=None):
+        """
+        hold or reject an order while the exchange does not accept orders
+
+        An order waits at most `timeout` seconds, or order_timeout if shorter.
+        """
+        if endpoint not in ORDER_ENDPOINTS or self.accepts_orders:
+            return
+        if timeout is None or (self.order_timeout is not None and self.order_timeout < timeout):
+            timeout = self.order_timeout
+        with self._cond:
+            if not self.block:
+                raise ExchangeUnavailableException(endpoint, self.health)
+            if not self._cond.wait_for(lambda: self.accepts_orders, timeout):
+                raise ExchangeUnavailableException(endpoint, self.health)
+
+    def start(self):
+        """
+        poll every scaled `interval` seconds in a background thread
+        """
+        self._stop.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                if self.api.logger:
+                    self.api.logger.error("Error: {}".format(sys.exc_info()[1]))
+            self._stop.wait(self.scale_interval(self.interval))
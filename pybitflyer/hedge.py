@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Event, Lock
+
+DEFAULT_ENDPOINTS = frozenset([
+    "/v1/ticker",
+    "/v1/board",
+    "/v1/getboardstate",
+    "/v1/gethealth",
+])
+
+
+class _Latency(object):
+    __slots__ = ("samples", "delay", "stale")
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.delay = None
+        self.stale = 0
+
+
+class HedgePolicy(object):
+    """
+    Hedged GET requests for latency-critical reads
+
+    HedgePolicy(endpoints=None, percentile=95, initial_delay=0.1, min_delay=0.005,
+                max_delay=1, budget=0.05, burst=10, window=500, max_workers=20)
+
+    When a request has not answered after the given percentile of the recent
+    latency of its endpoint, the same request is sent again on another
+    pooled connection and the first response wins. The response of the loser
+    is discarded. The delay counts from when the first request starts, and
+    first requests run on a pool of their own that grows with the number of
+    calls in flight, so they never queue behind hedges or each other.
+
+    Hedges are paid for with tokens: every request earns `budget` tokens, up
+    to `burst`, and every hedge costs one. With the default budget of 0.05 at
+    most about 5% extra requests are sent, however slow the exchange is.
+
+        api = pybitflyer.API(hedge=pybitflyer.HedgePolicy())
+
+    Parameters:
+        - endpoints -- GET endpoints to hedge (default: ticker, board,
+                       getboardstate and gethealth)
+        - percentile -- percentile of the recent latency after which a hedge is sent
+        - initial_delay -- hedge delay in seconds until 20 latencies are known
+        - min_delay -- lower bound of the hedge delay in seconds
+        - max_delay -- upper bound of the hedge delay in seconds
+        - budget -- hedge tokens earned per request
+        - burst -- maximum number of saved tokens
+        - window -- number of recent latencies per endpoint
+        - max_workers -- threads sending hedges (second requests)
+    """
+
+    min_samples = 20
+
+    # threads of first requests are started on demand and reused when idle;
+    # the limit only guards against runaway callers
+    max_primaries = 1024
+
+    def __init__(self, endpoints=None, percentile=95, initial_delay=0.1, min_delay=0.005,
+                 max_delay=1, budget=0.05, burst=10, window=500, max_workers=20):
+        self.endpoints = DEFAULT_ENDPOINTS if endpoints is None else frozenset(endpoints)
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.burst = burst
+        self.window = window
+        self.max_workers = max_workers
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self._tokens = burst
+        self._latency = {}
+        self._lock = Lock()
+        self._executor = None
+        self._primaries = None
+        self._pid = os.getpid()
+
+    def __reduce__(self):
+        return HedgePolicy, (self.endpoints, self.percentile, self.initial_delay, self.min_delay,
+                             self.max_delay, self.budget, self.burst, self.window, self.max_workers)
+
+    def covers(self, endpoint, method="GET"):
+        return method == "GET" and endpoint in self.endpoints
+
+    def delay(self, endpoint):
+        """
+        return the seconds to wait for a response of `endpoint` before hedging
+        """
+        with self._lock:
+            latency = self._latency.get(endpoint)
+            if latency is None or len(latency.samples) < self.min_samples:
+                return self.initial_delay
+            # the percentile is sorted again only every tenth of the window
+            if latency.delay is None or latency.stale > len(latency.samples) // 10:
+                samples = sorted(latency.samples)
+                index = min(int(len(samples) * self.percentile / 100.0), len(samples) - 1)
+                latency.delay = min(max(samples[index], self.min_delay), self.max_delay)
+                latency.stale = 0
+            return latency.delay
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            latency = self._latency.get(endpoint)
+            if latency is None:
+                latency = self._latency[endpoint] = _Latency(self.window)
+            latency.samples.append(seconds)
+            latency.stale += 1
+
+    def _earn(self):
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self._tokens + self.budget, self.burst)
+
+    def _spend(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedges += 1
+            return True
+
+    def _executors(self):
+        if self._pid != os.getpid():  # forked: the parent's threads are gone
+            self._executor = None
+            self._primaries = None
+            self._lock = Lock()
+            self._pid = os.getpid()
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._primaries = ThreadPoolExecutor(max_workers=self.max_primaries,
+                                                         thread_name_prefix="pybitflyer-primary")
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="pybitflyer-hedge")
+        return self._primaries, self._executor
+
+    def _submit(self, executor, endpoint, fetch, started=None):
+        def timed():
+            start = time.monotonic()
+            if started is not None:
+                started.start = start
+                started.set()
+            result = fetch()
+            self.record(endpoint, time.monotonic() - start)
+            return result
+
+        # in the caller's context, e.g. the deadline of a batch call
+        return executor.submit(contextvars.copy_context().run, timed)
+
+    def run(self, endpoint, fetch):
+        """
+        return fetch(), calling it a second time if the first call is slow
+        """
+        self._earn()
+        primaries, hedges = self._executors()
+        started = Event()
+        primary = self._submit(primaries, endpoint, fetch, started)
+        started.wait()
+        delay = self.delay(endpoint) - (time.monotonic() - started.start)
+        done, _ = wait([primary], timeout=max(delay, 0.0))
+        if done or not self._spend():
+            return primary.result()
+
+        hedge = self._submit(hedges, endpoint, fetch)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        """
+        return {"requests": n, "hedges": n, "wins": n, "delays": {endpoint: seconds}}
+        """
+        delays = dict((endpoint, self.delay(endpoint)) for endpoint in list(self._latency))
+        with self._lock:
+            return {"requests": self.requests, "hedges": self.hedges, "wins": self.wins,
+                    "delays": delays}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._primaries.shutdown(wait=False)
+            self._executor = None
+            self._primaries = None
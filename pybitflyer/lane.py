@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+from threading import Event, Lock, Thread
+from .endpoints import ORDER_ENDPOINTS, CANCEL_ENDPOINTS
+from .metrics import Histogram
+from .pool import ConnectionPool
+
+# endpoints sent over the lane
+LANE_ENDPOINTS = ORDER_ENDPOINTS | CANCEL_ENDPOINTS
+
+
+class OrderLane(object):
+    """
+    Dedicated pre-warmed connections for order placement and cancels
+
+    OrderLane(connections=2, ping_interval=15, ping_path="/v1/gethealth", logger=None)
+
+    sendchildorder, sendparentorder and the cancel endpoints are sent over
+    a ConnectionPool of their own, so they never queue behind a large
+    getexecutions or board download on a shared connection. The connections
+    are opened by start() and kept hot by a background thread that pings
+    them when the lane has been idle for `ping_interval` seconds, before the
+    server or a middlebox closes them. Like all connections of this
+    library, they have TCP_NODELAY set (urllib3's default socket options).
+
+    Round trips of orders and of pings are recorded in Histograms of their
+    own; see stats().
+
+        lane = pybitflyer.OrderLane(connections=2)
+        api = pybitflyer.API(api_key, api_secret, order_lane=lane)
+        lane.start(api.api_url)
+
+    Parameters:
+        - connections -- number of connections kept open
+        - ping_interval -- seconds of idleness after which connections are
+                           pinged (default: 15). Each ping is one request to
+                           ping_path and counts against the per-IP budget.
+        - ping_path -- public endpoint used to ping
+        - logger -- logger used to report failed pings
+    """
+
+    def __init__(self, connections=2, ping_interval=15, ping_path="/v1/gethealth", logger=None):
+        self.connections = connections
+        self.ping_interval = ping_interval
+        self.ping_path = ping_path
+        self.logger = logger
+        self.pool = ConnectionPool(pool_maxsize=connections, idle_timeout=None)
+        self.latency = Histogram()
+        self.ping_latency = Histogram()
+        self.last_used = 0.0
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+        self._url = None
+
+    def __reduce__(self):
+        # the copy is not started
+        return OrderLane, (self.connections, self.ping_interval, self.ping_path, self.logger)
+
+    @staticmethod
+    def covers(endpoint):
+        return endpoint in LANE_ENDPOINTS
+
+    def session(self):
+        self.last_used = time.monotonic()
+        return self.pool.session()
+
+    def record(self, seconds):
+        """
+        record the round trip of an order request
+        """
+        with self._lock:
+            self.latency.record(seconds)
+
+    def warmup(self):
+        """
+        open or refresh all connections in parallel and return their round trip times
+        """
+        times = self.pool.warmup(self.connections, self._url + self.ping_path, timeout=self.ping_interval)
+        with self._lock:
+            for seconds in times:
+                if seconds is not None:
+                    self.ping_latency.record(seconds)
+        if None in times and self.logger:
+            self.logger.error("Error: {} of {} order lane pings failed".format(
+                times.count(None), len(times)))
+        self.last_used = time.monotonic()
+        return times
+
+    def start(self, api_url="https://api.bitflyer.com"):
+        """
+        open the connections to `api_url` and keep them hot in a background thread
+        """
+        self._url = api_url
+        self.warmup()
+        self._stop.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.pool.close()
+
+    def _run(self):
+        while not self._stop.wait(max(self.last_used + self.ping_interval - time.monotonic(), 0.0)):
+            if time.monotonic() - self.last_used < self.ping_interval:
+                continue  # an order used the lane meanwhile
+            try:
+                self.warmup()
+            except Exception:
+                if self.logger:
+                    self.logger.error("Error: {}".format(sys.exc_info()[1]))
+                self.last_used = time.monotonic()
+
+    def stats(self, quantiles=(0.5, 0.99, 0.999)):
+        """
+        return {"orders": {...}, "pings": {...}} with count, mean, max and quantiles in seconds
+        """
+        result = {}
+        with self._lock:
+            for name, h in (("orders", self.latency), ("pings", self.ping_latency)):
+                stats = {"count": h.count, "mean": h.sum / h.count if h.count else None, "max": h.max}
+                for q in quantiles:
+                    stats["p{:g}".format(q * 100).replace(".", "")] = h.percentile(q * 100)
+                result[name] = stats
+        return result
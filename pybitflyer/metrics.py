@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from threading import Lock
+
+PHASES = ("wait", "transfer", "decode", "total")
+
+
+class Histogram(object):
+    """
+    Log-linear latency histogram in the style of HdrHistogram
+
+    Histogram(significant_bits=5)
+
+    Values are recorded in seconds and bucketed in microseconds. Each power
+    of two is split into 2**significant_bits buckets, so percentiles are
+    accurate to about 1 / 2**significant_bits (3% by default) with a few
+    hundred buckets at most.
+    """
+
+    def __init__(self, significant_bits=5):
+        self.significant_bits = significant_bits
+        self.counts = defaultdict(int)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, us):
+        shift = max(us.bit_length() - self.significant_bits - 1, 0)
+        return shift, us >> shift
+
+    def record(self, seconds):
+        self.counts[self._bucket(max(int(seconds * 1e6), 0))] += 1
+        self.count += 1
+        self.sum += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        return the q-th percentile (0 < q <= 100) in seconds, or None when empty
+        """
+        if self.count == 0:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for shift, mantissa in sorted(self.counts):
+            seen += self.counts[(shift, mantissa)]
+            if seen >= rank:
+                # middle of the bucket
+                return ((mantissa << shift) + ((1 << shift) - 1) / 2.0) / 1e6
+        return self.max
+
+
+def _labels(**labels):
+    return ",".join('{}="{}"'.format(k, str(v).replace('"', '\\"')) for k, v in labels.items())
+
+
+class Metrics(object):
+    """
+    Per-endpoint request metrics
+
+    Metrics(quantiles=(0.5, 0.99, 0.999))
+
+    Pass to API(metrics=...) to record the count of requests by endpoint and
+    status code, retries, errors, and latency histograms of these phases:
+
+        wait -- from sending the request to receiving the response headers,
+                including connection setup and TLS when a new connection is made
+        transfer -- reading the response body
+        decode -- JSON decoding
+        total -- the whole attempt
+
+    Every attempt is recorded with its own status or error, so a call
+    retried after a 503 counts one 503 and one 200; retries counts the
+    attempts after the first.
+
+    Any object with the same record() and record_error() methods can be used
+    instead. When API.metrics is None nothing is measured.
+
+    Parameters:
+        - quantiles -- quantiles reported by snapshot() and to_openmetrics()
+    """
+
+    def __init__(self, quantiles=(0.5, 0.99, 0.999)):
+        self.quantiles = quantiles
+        self.requests = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.histograms = defaultdict(Histogram)
+        self._lock = Lock()
+
+    def __reduce__(self):
+        # each process records its own requests
+        return Metrics, (self.quantiles,)
+
+    def record(self, endpoint, method, status, timings, retries=0):
+        """
+        record one response; timings is a dict of phase to seconds
+        """
+        with self._lock:
+            self.requests[(endpoint, status)] += 1
+            if retries:
+                self.retries[endpoint] += retries
+            for phase, seconds in timings.items():
+                self.histograms[(endpoint, phase)].record(seconds)
+
+    def record_error(self, endpoint, method, error):
+        """
+        record a request that raised before a response was received
+        """
+        with self._lock:
+            self.errors[(endpoint, type(error).__name__)] += 1
+
+    def snapshot(self):
+        """
+        return {endpoint: {"requests": {status: n}, "retries": n, "errors": {name: n},
+                           "latency": {phase: {"count", "mean", "p50", "p99", ...}}}}
+        """
+        result = defaultdict(lambda: {"requests": {}, "retries": 0, "errors": {}, "latency": {}})
+        with self._lock:
+            for (endpoint, status), n in self.requests.items():
+                result[endpoint]["requests"][status] = n
+            for endpoint, n in self.retries.items():
+                result[endpoint]["retries"] = n
+            for (endpoint, name), n in self.errors.items():
+                result[endpoint]["errors"][name] = n
+            for (endpoint, phase), h in self.histograms.items():
+                stats = {"count": h.count, "mean": h.sum / h.count, "max": h.max}
+                for q in self.quantiles:
+                    stats["p{:g}".format(q * 100).replace(".", "")] = h.percentile(q * 100)
+                result[endpoint]["latency"][phase] = stats
+        return dict(result)
+
+    def to_openmetrics(self, prefix="pybitflyer"):
+        """
+        return the metrics in the Prometheus / OpenMetrics text format
+        """
+        lines = []
+        with self._lock:
+            lines.append("# TYPE {}_requests counter".format(prefix))
+            for (endpoint, status), n in sorted(self.requests.items()):
+                lines.append("{}_requests_total{{{}}} {}".format(
+                    prefix, _labels(endpoint=endpoint, status=status), n))
+            lines.append("# TYPE {}_retries counter".format(prefix))
+            for endpoint, n in sorted(self.retries.items()):
+                lines.append("{}_retries_total{{{}}} {}".format(prefix, _labels(endpoint=endpoint), n))
+            lines.append("# TYPE {}_errors counter".format(prefix))
+            for (endpoint, name), n in sorted(self.errors.items()):
+                lines.append("{}_errors_total{{{}}} {}".format(
+                    prefix, _labels(endpoint=endpoint, error=name), n))
+            lines.append("# TYPE {}_request_seconds summary".format(prefix))
+            lines.append("# UNIT {}_request_seconds seconds".format(prefix))
+            for (endpoint, phase), h in sorted(self.histograms.items()):
+                for q in self.quantiles:
+                    lines.append("{}_request_seconds{{{}}} {:.6f}".format(
+                        prefix, _labels(endpoint=endpoint, phase=phase, quantile=q), h.percentile(q * 100)))
+                labels = _labels(endpoint=endpoint, phase=phase)
+                lines.append("{}_request_seconds_count{{{}}} {}".format(prefix, labels, h.count))
+                lines.append("{}_request_seconds_sum{{{}}} {:.6f}".format(prefix, labels, h.sum))
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
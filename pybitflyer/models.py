@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+from array import array
+from collections import namedtuple
+
+
+def _model(name, fields):
+    cls = namedtuple(name, fields)
+    cls.__new__.__defaults__ = (None,) * len(cls._fields)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(*map(d.get, cls._fields))
+
+    cls.from_dict = from_dict
+    return cls
+
+
+Market = _model("Market", [
+    "product_code", "market_type", "alias"])
+
+Ticker = _model("Ticker", [
+    "product_code", "state", "timestamp", "tick_id", "best_bid", "best_ask",
+    "best_bid_size", "best_ask_size", "total_bid_depth", "total_ask_depth",
+    "market_bid_size", "market_ask_size", "ltp", "volume", "volume_by_product"])
+
+Execution = _model("Execution", [
+    "id", "side", "price", "size", "exec_date",
+    "buy_child_order_acceptance_id", "sell_child_order_acceptance_id"])
+
+PrivateExecution = _model("PrivateExecution", [
+    "id", "child_order_id", "side", "price", "size", "commission",
+    "exec_date", "child_order_acceptance_id"])
+
+ChildOrder = _model("ChildOrder", [
+    "id", "child_order_id", "product_code", "side", "child_order_type",
+    "price", "average_price", "size", "child_order_state", "expire_date",
+    "child_order_date", "child_order_acceptance_id", "outstanding_size",
+    "cancel_size", "executed_size", "total_commission", "time_in_force"])
+
+Position = _model("Position", [
+    "product_code", "side", "price", "size", "commission",
+    "swap_point_accumulate", "require_collateral", "open_date", "leverage",
+    "pnl", "sfd"])
+
+Balance = _model("Balance", [
+    "currency_code", "amount", "available"])
+
+Collateral = _model("Collateral", [
+    "collateral", "open_position_pnl", "require_collateral", "keep_rate",
+    "margin_call_amount", "margin_call_due_date"])
+
+
+class ExecutionList(object):
+    """
+    Executions stored as columns (struct of arrays)
+
+    id, price and size are typed arrays; the other fields are lists. Rows are
+    materialized as Execution tuples only when indexed or iterated.
+    """
+
+    __slots__ = ("id", "side", "price", "size", "exec_date",
+                 "buy_child_order_acceptance_id", "sell_child_order_acceptance_id")
+
+    def __init__(self, executions=()):
+        self.id = array("q", [e["id"] for e in executions])
+        self.side = [e["side"] for e in executions]
+        self.price = array("d", [e["price"] for e in executions])
+        self.size = array("d", [e["size"] for e in executions])
+        self.exec_date = [e["exec_date"] for e in executions]
+        self.buy_child_order_acceptance_id = [e.get("buy_child_order_acceptance_id") for e in executions]
+        self.sell_child_order_acceptance_id = [e.get("sell_child_order_acceptance_id") for e in executions]
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, i):
+        return Execution(*(getattr(self, f)[i] for f in self.__slots__))
+
+    def __iter__(self):
+        return map(Execution._make, zip(*(getattr(self, f) for f in self.__slots__)))
+
+    def __repr__(self):
+        return "ExecutionList(len={})".format(len(self))
+
+
+class Board(object):
+    """
+    Order book stored as price and size arrays per side, best level first
+    """
+
+    __slots__ = ("mid_price", "bid_prices", "bid_sizes", "ask_prices", "ask_sizes")
+
+    def __init__(self, board):
+        self.mid_price = board.get("mid_price")
+        bids = board.get("bids", ())
+        asks = board.get("asks", ())
+        self.bid_prices = array("d", [b["price"] for b in bids])
+        self.bid_sizes = array("d", [b["size"] for b in bids])
+        self.ask_prices = array("d", [a["price"] for a in asks])
+        self.ask_sizes = array("d", [a["size"] for a in asks])
+
+    def __repr__(self):
+        return "Board(mid_price={}, bids={}, asks={})".format(
+            self.mid_price, len(self.bid_prices), len(self.ask_prices))
+
+
+def field(row, name):
+    """
+    return a field of a row, whether it is a dict or a model
+    """
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def _list_of(model):
+    return lambda content: [model.from_dict(d) for d in content]
+
+
+CONVERTERS = {
+    "/v1/markets": _list_of(Market),
+    "/v1/ticker": Ticker.from_dict,
+    "/v1/board": Board,
+    "/v1/executions": ExecutionList,
+    "/v1/me/getexecutions": _list_of(PrivateExecution),
+    "/v1/me/getchildorders": _list_of(ChildOrder),
+    "/v1/me/getpositions": _list_of(Position),
+    "/v1/me/getbalance": _list_of(Balance),
+    "/v1/me/getcollateral": Collateral.from_dict,
+}
+
+# endpoints answering with an object rather than a list
+_OBJECT_ENDPOINTS = frozenset(["/v1/ticker", "/v1/board", "/v1/me/getcollateral"])
+
+
+def convert(endpoint, content):
+    """
+    convert a decoded response to its model; responses without a model are returned as is
+
+    Empty responses, including an empty body (""), convert to empty models
+    (e.g. an empty ExecutionList). Models are built from the fully decoded
+    response, so they shrink what is retained, not the peak memory of
+    decoding it.
+    """
+    converter = CONVERTERS.get(endpoint)
+    if converter is None or content is None:
+        return content
+    if content == "":
+        content = {} if endpoint in _OBJECT_ENDPOINTS else []
+    return converter(content)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_left
+from itertools import islice
+from .models import Board
+
+
+class _Side(object):
+    """
+    price levels of one side, kept as parallel lists sorted with the best level last
+
+    Prices are stored as sign * price so that both sides sort ascending:
+    bids with sign 1, asks with sign -1.
+    """
+
+    __slots__ = ("sign", "keys", "sizes")
+
+    def __init__(self, sign):
+        self.sign = sign
+        self.keys = []
+        self.sizes = []
+
+    def load(self, prices, sizes):
+        sign = self.sign
+        pairs = sorted((sign * p, s) for p, s in zip(prices, sizes) if s > 0)
+        self.keys[:] = [k for k, _ in pairs]
+        self.sizes[:] = [s for _, s in pairs]
+
+    def set(self, price, size):
+        keys = self.keys
+        key = self.sign * price
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if size > 0:
+                self.sizes[i] = size
+            else:
+                del keys[i]
+                del self.sizes[i]
+        elif size > 0:
+            keys.insert(i, key)
+            self.sizes.insert(i, size)
+
+    def size_at(self, price):
+        keys = self.keys
+        key = self.sign * price
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return self.sizes[i]
+        return 0.0
+
+    def best(self):
+        if not self.keys:
+            return None
+        return self.sign * self.keys[-1], self.sizes[-1]
+
+    def levels(self, n=None):
+        pairs = islice(zip(reversed(self.keys), reversed(self.sizes)), n)
+        return [(self.sign * k, s) for k, s in pairs]
+
+    def cumulative_size(self, price):
+        return sum(self.sizes[bisect_left(self.keys, self.sign * price):])
+
+    def vwap(self, size):
+        remaining = size
+        notional = 0.0
+        keys, sizes = self.keys, self.sizes
+        for i in range(len(keys) - 1, -1, -1):
+            take = min(sizes[i], remaining)
+            notional += take * self.sign * keys[i]
+            remaining -= take
+            if remaining <= 0:
+                return notional / size
+        return None
+
+
+class OrderBook(object):
+    """
+    Incremental order book built from board snapshots and diffs
+
+    OrderBook(board=None)
+
+    Price levels are kept in sorted lists and located by binary search, so an
+    update costs O(log n) plus a shift of the levels behind it, which is small
+    because updates cluster near the best prices at the end of each list.
+
+        book = OrderBook(api.board(product_code="BTC_JPY"))
+        book.update(message)  # from lightning_board_BTC_JPY
+        book.best_bid(), book.vwap("BUY", 1.0)
+
+    Parameters:
+        - board -- response of API.board (dict or models.Board) or a board_snapshot message
+    """
+
+    def __init__(self, board=None):
+        self.mid_price = None
+        self.bids = _Side(1)
+        self.asks = _Side(-1)
+        if board is not None:
+            self.reset(board)
+
+    def _side(self, side):
+        # BUY walks the asks and SELL walks the bids, as a taker would
+        if side in ("BUY", "ask", "asks"):
+            return self.asks
+        if side in ("SELL", "bid", "bids"):
+            return self.bids
+        raise ValueError("side must be BUY, SELL, bids or asks: {}".format(side))
+
+    def reset(self, board):
+        """
+        replace the whole book with a board snapshot (dict or models.Board)
+        """
+        if isinstance(board, Board):
+            self.mid_price = board.mid_price
+            self.bids.load(board.bid_prices, board.bid_sizes)
+            self.asks.load(board.ask_prices, board.ask_sizes)
+            return
+        if board.get("mid_price") is not None:
+            self.mid_price = board["mid_price"]
+        bids = board.get("bids", ())
+        asks = board.get("asks", ())
+        self.bids.load([b["price"] for b in bids], [b["size"] for b in bids])
+        self.asks.load([a["price"] for a in asks], [a["size"] for a in asks])
+
+    def update(self, diff):
+        """
+        apply a board diff; levels with size 0 are removed
+        """
+        if diff.get("mid_price") is not None:
+            self.mid_price = diff["mid_price"]
+        bids, asks = self.bids, self.asks
+        for level in diff.get("bids", ()):
+            bids.set(level["price"], level["size"])
+        for level in diff.get("asks", ()):
+            asks.set(level["price"], level["size"])
+
+    def best_bid(self):
+        """
+        return (price, size) of the best bid, or None
+        """
+        return self.bids.best()
+
+    def best_ask(self):
+        """
+        return (price, size) of the best ask, or None
+        """
+        return self.asks.best()
+
+    def spread(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def size_at(self, side, price):
+        """
+        return the size resting at `price` on `side` ("bids" or "asks")
+        """
+        return self._side(side).size_at(price)
+
+    def depth(self, side, levels=None):
+        """
+        return up to `levels` (price, size) pairs of `side`, best first
+        """
+        return self._side(side).levels(levels)
+
+    def cumulative_size(self, side, price):
+        """
+        return the total size on `side` at `price` or better
+        """
+        return self._side(side).cumulative_size(price)
+
+    def vwap(self, side, size):
+        """
+        return the average price of a market order of `size`, or None if the book is too thin
+
+        side is "BUY" (walks the asks) or "SELL" (walks the bids).
+        """
+        return self._side(side).vwap(size)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from threading import RLock, Thread, Event
+from .exception import APIException
+from .models import field
+from .pagination import paginate
+
+OPEN_STATES = ("ACTIVE", "CANCELING")
+
+# default minute_to_expire of sendchildorder (30 days)
+DEFAULT_MINUTE_TO_EXPIRE = 43200
+
+
+def _epoch(date):
+    # expire_date of getchildorders, e.g. "2024-01-01T00:00:00" or with fractions, in UTC
+    return datetime.strptime(date[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+class OrderManager(object):
+    """
+    Local order and position state for one product
+
+    OrderManager(api, product_code, interval=5, grace=10)
+
+    Orders sent and canceled through the manager are recorded as soon as the
+    API answers. reconcile() then applies only what changed on the exchange:
+    executions after the last one seen (getexecutions with `after`) and the
+    state of orders that are not confirmed yet: new orders neither listed as
+    ACTIVE nor executed, orders being canceled, and expired orders. Orders
+    whose state is known are not looked up again. open_orders(), order() and
+    position answer from memory without an HTTP call.
+
+        manager = OrderManager(api, "FX_BTC_JPY")
+        manager.start()
+        order = manager.send(child_order_type="LIMIT", side="BUY", price=price, size=0.01)
+        manager.open_orders(), manager.position
+
+    Orders are dicts with the fields of getchildorders; an order whose cancel
+    was accepted but not yet confirmed is in the local state "CANCELING".
+
+    Parameters:
+        - api -- API with api key and api secret
+        - product_code -- product of the orders
+        - interval -- seconds between reconciliations when started (default: 5),
+                      stretched by the API's HealthMonitor if it has one
+        - grace -- seconds a new or canceled order may be unconfirmed by the
+                   exchange before its state is looked up (default: 10)
+    """
+
+    def __init__(self, api, product_code, interval=5, grace=10):
+        self.api = api
+        self.product_code = product_code
+        self.interval = interval
+        self.grace = grace
+        self.position = 0.0
+        self.orders = {}
+        self._by_state = defaultdict(set)
+        self._pending = {}   # acceptance id: time since which its state is unconfirmed
+        self._expires = {}   # acceptance id: expiry in seconds since the epoch
+        self._unmatched = defaultdict(list)  # acceptance id: [(time, size)] of unknown orders
+        self._last_execution_id = None
+        self._lock = RLock()
+        self._stop = Event()
+        self._thread = None
+
+    def _store(self, order):
+        aid = order["child_order_acceptance_id"]
+        old = self.orders.get(aid)
+        if old is not None:
+            self._by_state[old["child_order_state"]].discard(aid)
+        self.orders[aid] = order
+        self._by_state[order["child_order_state"]].add(aid)
+
+    def _set_state(self, order, state):
+        self._by_state[order["child_order_state"]].discard(order["child_order_acceptance_id"])
+        order["child_order_state"] = state
+        self._by_state[state].add(order["child_order_acceptance_id"])
+
+    def initialize(self):
+        """
+        load ACTIVE orders and the open position, and start counting executions from now
+
+        The latest execution is read before and after them, and they are read
+        again until it did not change, so that no execution is both in the
+        loaded state and applied by reconcile().
+        """
+        latest = self._latest_execution_id()
+        while True:
+            active = list(paginate(self.api.getchildorders, product_code=self.product_code,
+                                   child_order_state="ACTIVE"))
+            try:
+                positions = self.api.getpositions(product_code=self.product_code)
+            except APIException:
+                positions = []  # not a margin product
+            last = self._latest_execution_id()
+            if last == latest:
+                break
+            latest = last
+        with self._lock:
+            self._last_execution_id = latest
+            for order in active:
+                order = self._as_dict(order)
+                self._store(order)
+                if order.get("expire_date"):
+                    self._expires[order["child_order_acceptance_id"]] = _epoch(order["expire_date"])
+            self.position = round(sum(field(p, "size") if field(p, "side") == "BUY" else -field(p, "size")
+                                      for p in positions), 8)
+
+    def _latest_execution_id(self):
+        latest = self.api.getexecutions(product_code=self.product_code, count=1)
+        return field(latest[0], "id") if latest else 0
+
+    @staticmethod
+    def _as_dict(order):
+        return dict(order) if isinstance(order, dict) else order._asdict()
+
+    def send(self, **params):
+        """
+        send a child order (see API.sendchildorder) and record it as ACTIVE
+        """
+        params.setdefault("product_code", self.product_code)
+        response = self.api.sendchildorder(**params)
+        aid = response["child_order_acceptance_id"]
+        order = dict(params, child_order_acceptance_id=aid, child_order_state="ACTIVE",
+                     executed_size=0.0, outstanding_size=params.get("size"))
+        expires = time.time() + 60 * params.get("minute_to_expire", DEFAULT_MINUTE_TO_EXPIRE)
+        with self._lock:
+            if aid not in self.orders:  # reconcile() may have recorded it first
+                self._store(order)
+                self._pending[aid] = time.monotonic()
+                self._expires[aid] = expires
+                # executions reconcile() saw before the order was recorded
+                for _, size in self._unmatched.pop(aid, ()):
+                    self._fill(order, size)
+            return dict(self.orders[aid])
+
+    def cancel(self, child_order_acceptance_id):
+        """
+        cancel a child order (see API.cancelchildorder) and record it as CANCELING
+        """
+        self.api.cancelchildorder(product_code=self.product_code,
+                                  child_order_acceptance_id=child_order_acceptance_id)
+        with self._lock:
+            order = self.orders.get(child_order_acceptance_id)
+            if order is not None and order["child_order_state"] == "ACTIVE":
+                self._set_state(order, "CANCELING")
+                self._pending[child_order_acceptance_id] = time.monotonic()
+
+    def reconcile(self):
+        """
+        apply executions and order state changes since the last call
+        """
+        if self._last_execution_id is None:
+            self.initialize()
+            return
+        executions = list(paginate(self.api.getexecutions, product_code=self.product_code,
+                                   after=self._last_execution_id))
+        with self._lock:
+            now = time.monotonic()
+            for aid in [aid for aid, rows in self._unmatched.items() if now - rows[-1][0] > self.grace]:
+                del self._unmatched[aid]  # not an order of this manager
+            for e in reversed(executions):
+                self._apply_execution(e)
+            if executions:
+                self._last_execution_id = max(field(e, "id") for e in executions)
+            clock = time.time()
+            stale = [aid for state in OPEN_STATES for aid in self._by_state[state]
+                     if now - self._pending.get(aid, now) > self.grace
+                     or self._expires.get(aid, clock) < clock]
+        if not stale:
+            return
+        active = dict((field(o, "child_order_acceptance_id"), self._as_dict(o)) for o in
+                      paginate(self.api.getchildorders, product_code=self.product_code,
+                               child_order_state="ACTIVE"))
+        for aid in stale:
+            remote = active.get(aid)
+            if remote is None:
+                found = self.api.getchildorders(product_code=self.product_code,
+                                                child_order_acceptance_id=aid)
+                if not found:
+                    continue
+                remote = self._as_dict(found[0])
+            with self._lock:
+                self._confirm(aid, remote)
+
+    def _confirm(self, aid, remote):
+        order = self.orders.get(aid)
+        if remote["child_order_state"] == "ACTIVE" and order is not None:
+            if order["child_order_state"] == "CANCELING":
+                return  # the cancel is not processed yet
+            # keep the local sizes, which may include executions the listing predates
+        else:
+            self._store(remote)
+        self._pending.pop(aid, None)
+        if remote["child_order_state"] not in OPEN_STATES:
+            self._expires.pop(aid, None)
+        elif remote.get("expire_date"):
+            self._expires[aid] = _epoch(remote["expire_date"])
+
+    def _apply_execution(self, e):
+        size = field(e, "size")
+        self.position = round(self.position + (size if field(e, "side") == "BUY" else -size), 8)
+        aid = field(e, "child_order_acceptance_id")
+        order = self.orders.get(aid)
+        if order is None:
+            # the order may be sent but not recorded by send() yet
+            self._unmatched[aid].append((time.monotonic(), size))
+            return
+        self._fill(order, size)
+
+    def _fill(self, order, size):
+        aid = order["child_order_acceptance_id"]
+        if order["child_order_state"] == "ACTIVE":
+            self._pending.pop(aid, None)  # an execution confirms the order
+        order["executed_size"] = round((order.get("executed_size") or 0.0) + size, 8)
+        if order.get("outstanding_size") is not None:
+            order["outstanding_size"] = round(max(order["outstanding_size"] - size, 0.0), 8)
+            if order["outstanding_size"] == 0 and order["child_order_state"] in OPEN_STATES:
+                self._set_state(order, "COMPLETED")
+                self._pending.pop(aid, None)
+                self._expires.pop(aid, None)
+
+    def order(self, child_order_acceptance_id):
+        """
+        return a copy of an order, or None
+        """
+        with self._lock:
+            order = self.orders.get(child_order_acceptance_id)
+            return None if order is None else dict(order)
+
+    def orders_in(self, *states):
+        """
+        return copies of the orders in any of `states`
+        """
+        with self._lock:
+            return [dict(self.orders[aid]) for state in states for aid in self._by_state[state]]
+
+    def open_orders(self):
+        """
+        return copies of the orders that may still execute (ACTIVE or CANCELING)
+        """
+        return self.orders_in(*OPEN_STATES)
+
+    def start(self):
+        """
+        reconcile every `interval` seconds in a background thread
+        """
+        self._stop.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.reconcile()
+            except Exception:
+                if self.api.logger:
+                    self.api.logger.error("Error: {}".format(sys.exc_info()[1]))
+            health = getattr(self.api, "health", None)
+            self._stop.wait(self.interval if health is None else health.scale_interval(self.interval))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from .models import field
+
+DATE_KEYS = {
+    "executions": "exec_date",
+    "getexecutions": "exec_date",
+    "getchildorders": "child_order_date",
+    "getparentorders": "parent_order_date",
+    "getbalancehistory": "event_date",
+    "getcollateralhistory": "date",
+    "getcoinins": "event_date",
+    "getcoinouts": "event_date",
+    "getdeposits": "event_date",
+    "getwithdrawals": "event_date",
+}
+
+
+def _isoformat(date):
+    if isinstance(date, datetime):
+        if date.tzinfo is not None:
+            date = date.astimezone(timezone.utc).replace(tzinfo=None)
+        date = date.isoformat()
+    return None if date is None else _comparable(date)
+
+
+def _comparable(date):
+    # "2024-01-01T00:00:00.12Z" -> "2024-01-01T00:00:00.120000", so that
+    # dates of any fractional precision compare correctly as strings
+    head, _, fraction = date.rstrip("Z").partition(".")
+    return head + "." + fraction.ljust(6, "0")[:6]
+
+
+class _Cursor(object):
+    """
+    state of a walk from the newest page to older pages with the `before` cursor
+    """
+
+    def __init__(self, method, count, before, after, since, date_key, params):
+        self.count = count
+        self.before = before
+        self.after = after
+        self.since = _isoformat(since)
+        if since is not None and date_key is None:
+            date_key = DATE_KEYS.get(getattr(method, "__name__", None))
+            if date_key is None:
+                raise ValueError("date_key is required to stop at a time bound")
+        self.date_key = date_key
+        self.params = params
+        self.seen = frozenset()
+        self.done = False
+
+    def next_params(self):
+        params = dict(self.params, count=self.count)
+        if self.before is not None:
+            params["before"] = self.before
+        if self.after is not None:
+            params["after"] = self.after
+        return params
+
+    def advance(self, page):
+        """
+        filter one page and move the cursor past it
+        """
+        rows = []
+        ids = set()
+        for row in page or ():
+            id_ = field(row, "id")
+            ids.add(id_)
+            if id_ in self.seen:
+                continue
+            if self.since is not None and _comparable(field(row, self.date_key)) < self.since:
+                self.done = True
+                break
+            rows.append(row)
+        if not page or self.done:
+            self.done = True
+            return rows
+        oldest = min(ids)
+        if self.before is not None and oldest >= self.before:
+            self.done = True
+        self.before = oldest
+        self.seen = ids
+        return rows
+
+
+def paginate(method, count=500, before=None, after=None, since=None,
+             date_key=None, prefetch=True, **params):
+    """
+    Iterate lazily over the rows of a paginated endpoint, newest first
+
+    paginate(api.executions, product_code="BTC_JPY", after=2560000000)
+
+    Pages are requested with the `before` cursor until an empty page, the
+    `after` id or the `since` time is reached. Ids repeated in adjacent pages
+    are yielded once. Only one or two pages are held in memory at a time.
+
+    Parameters:
+        - method -- bound API method, e.g. api.executions or api.getchildorders
+        - count -- rows per page (default: 500)
+        - before -- start below this id (default: newest)
+        - after -- stop at this id (exclusive)
+        - since -- stop at rows older than this datetime or ISO 8601 string (UTC)
+        - date_key -- row key holding the date; inferred for known endpoints
+        - prefetch -- fetch the next page while the current one is consumed
+        - params -- other parameters passed to method, e.g. product_code
+    """
+    cursor = _Cursor(method, count, before, after, since, date_key, params)
+    if not prefetch:
+        while not cursor.done:
+            yield from cursor.advance(method(**cursor.next_params()))
+        return
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(method, **cursor.next_params())
+        while future is not None:
+            rows = cursor.advance(future.result())
+            future = None if cursor.done else executor.submit(method, **cursor.next_params())
+            yield from rows
+    finally:
+        executor.shutdown(wait=False)
+
+
+async def apaginate(method, count=500, before=None, after=None, since=None,
+                    date_key=None, prefetch=True, **params):
+    """
+    Async version of paginate() for AsyncAPI methods
+
+    async for execution in apaginate(api.executions, product_code="BTC_JPY"):
+        ...
+    """
+    cursor = _Cursor(method, count, before, after, since, date_key, params)
+    if not prefetch:
+        while not cursor.done:
+            for row in cursor.advance(await method(**cursor.next_params())):
+                yield row
+        return
+
+    task = asyncio.ensure_future(method(**cursor.next_params()))
+    try:
+        while task is not None:
+            rows = cursor.advance(await task)
+            task = None if cursor.done else asyncio.ensure_future(method(**cursor.next_params()))
+            for row in rows:
+                yield row
+    finally:
+        if task is not None:
+            task.cancel()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import heapq
+import pickle
+import itertools
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Lock, Thread
+from .pybitflyer import _body_crc
+
+Update = namedtuple("Update", ("method", "params", "value", "time"))
+
+
+class Subscription(object):
+    """
+    Bounded queue of updates; when it is full the oldest update is dropped
+
+    Iterate over it, or call get(), from the consumer's thread.
+    """
+
+    def __init__(self, poller, methods=None, product_codes=None, maxsize=100):
+        self.poller = poller
+        self.methods = None if methods is None else frozenset(methods)
+        self.product_codes = None if product_codes is None else frozenset(product_codes)
+        self.dropped = 0
+        self.closed = False
+        self._queue = deque(maxlen=maxsize)
+        self._cond = Condition()
+
+    def matches(self, method, params):
+        return ((self.methods is None or method in self.methods) and
+                (self.product_codes is None or params.get("product_code") in self.product_codes))
+
+    def put(self, update):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(update)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        return the oldest update, or None after `timeout` seconds or when closed
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queue or self.closed, timeout):
+                return None
+            return self._queue.popleft() if self._queue else None
+
+    def __iter__(self):
+        while True:
+            update = self.get()
+            if update is None:
+                return
+            yield update
+
+    def close(self):
+        self.poller.unsubscribe(self)
+        self._finish()
+
+    def _finish(self):
+        # wake up consumers; updates still queued can be read
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class _Job(object):
+    __slots__ = ("method", "params", "interval", "digest", "running", "polls", "changes")
+
+    def __init__(self, method, params, interval):
+        self.method = method
+        self.params = params
+        self.interval = interval
+        self.digest = None
+        self.running = False
+        self.polls = 0
+        self.changes = 0
+
+
+class MarketDataPoller(object):
+    """
+    Polls market data of many products from one scheduler thread
+
+    MarketDataPoller(api, max_workers=8, max_rate=None)
+
+    Polls are kept in a heap ordered by due time, and their first due times
+    are staggered within their interval so that polls of the same interval
+    do not fire together. Requests run on a small thread pool over the API's
+    pooled connections; a poll whose previous request is still in flight is
+    skipped. When the polls would send more than `max_rate` requests per
+    second, all intervals are stretched to fit.
+
+    A response identical to the previous one of the same poll (by a crc32 of
+    the response body as received; a ResponseCache keeps it with the
+    response) is not delivered. Subscribers receive Update(method, params,
+    value, time) tuples through bounded queues that drop the oldest update
+    when the consumer falls behind.
+
+        poller = MarketDataPoller(api)
+        for product_code in ("BTC_JPY", "FX_BTC_JPY", "ETH_JPY"):
+            poller.add("ticker", 1, product_code=product_code)
+            poller.add("board", 2, product_code=product_code)
+        poller.add("getboardstate", 5, product_code="FX_BTC_JPY")
+        subscription = poller.subscribe(methods=["ticker"])
+        poller.start()
+        for update in subscription:
+            ...
+
+    Parameters:
+        - api -- API the polls are sent with
+        - max_workers -- maximum number of requests in flight
+        - max_rate -- maximum requests per second of all polls. Defaults to
+                      the per-IP budget of api.rate_limiter, if it has one.
+    """
+
+    def __init__(self, api, max_workers=8, max_rate=None):
+        self.api = api
+        self.max_workers = max_workers
+        if max_rate is None and api.rate_limiter is not None and "ip" in api.rate_limiter.windows:
+            window = api.rate_limiter.windows["ip"]
+            max_rate = float(window.limit) / window.period
+        self.max_rate = max_rate
+        self.jobs = {}
+        self.errors = 0
+        self._subscriptions = []
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = Condition()
+        self._lock = Lock()
+        self._executor = None
+        self._thread = None
+        self._running = False
+
+    @staticmethod
+    def _key(method, params):
+        return method, tuple(sorted(params.items()))
+
+    def add(self, method, interval, **params):
+        """
+        poll the API method named `method` (e.g. "ticker") with `params` every `interval` seconds
+        """
+        key = self._key(method, params)
+        self.remove(method, **params)
+        with self._cond:
+            job = self.jobs[key] = _Job(method, params, interval)
+            # stagger polls of the same interval by the golden ratio
+            same = sum(1 for j in self.jobs.values() if j.interval == interval)
+            offset = interval * ((same * 0.6180339887) % 1.0)
+            heapq.heappush(self._heap, (time.monotonic() + offset, next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    def remove(self, method, **params):
+        with self._cond:
+            job = self.jobs.pop(self._key(method, params), None)
+            if job is not None:
+                self._heap = [entry for entry in self._heap if entry[2] is not job]
+                heapq.heapify(self._heap)
+
+    def stretch(self):
+        """
+        return the factor applied to intervals to stay within max_rate (1 when within it)
+        """
+        if not self.max_rate:
+            return 1.0
+        rate = sum(1.0 / job.interval for job in self.jobs.values())
+        return max(rate / self.max_rate, 1.0)
+
+    def subscribe(self, methods=None, product_codes=None, maxsize=100):
+        """
+        return a Subscription to updates of `methods` and `product_codes` (default: all)
+        """
+        subscription = Subscription(self, methods, product_codes, maxsize)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _digest(self, value):
+        # only for values whose response body was not recorded
+        try:
+            data = self.api.codec.dumps(value)
+        except TypeError:  # models that the codec cannot encode
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return zlib.crc32(data)
+
+    def _poll(self, job):
+        try:
+            crcs = []
+            token = _body_crc.set(crcs)
+            try:
+                value = getattr(self.api, job.method)(**job.params)
+            finally:
+                _body_crc.reset(token)
+            # the first body read is the winner's when the request was hedged
+            digest = crcs[0] if crcs else self._digest(value)
+            job.polls += 1
+            if digest == job.digest:
+                return
+            job.digest = digest
+            job.changes += 1
+            update = Update(job.method, job.params, value, time.time())
+            with self._lock:
+                subscriptions = [s for s in self._subscriptions if s.matches(job.method, job.params)]
+            for subscription in subscriptions:
+                subscription.put(update)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            if self.api.logger:
+                self.api.logger.error("Error: {}".format(sys.exc_info()[1]))
+        finally:
+            job.running = False
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                if not self._heap or self._heap[0][0] > now:
+                    self._cond.wait(None if not self._heap else self._heap[0][0] - now)
+                    continue
+                due, _, job = heapq.heappop(self._heap)
+                # reschedule from the due time, not from now, so that polls do not drift
+                interval = job.interval * self.stretch()
+                next_due = due + interval
+                if next_due < now:  # fell behind; skip the missed polls
+                    next_due = now + interval
+                heapq.heappush(self._heap, (next_due, next(self._seq), job))
+                if not job.running:
+                    job.running = True
+                    self._executor.submit(self._poll, job)
+
+    def start(self):
+        """
+        start the scheduler thread
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="pybitflyer-poller")
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription._finish()
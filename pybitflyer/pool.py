@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import socket
+import requests
+from threading import Lock, Thread
+from http import cookiejar
+from requests.adapters import HTTPAdapter
+
+
+class TCPKeepAliveAdapter(HTTPAdapter):
+    def __init__(self, **kwargs):
+        super(TCPKeepAliveAdapter, self).__init__(**kwargs)
+    def init_poolmanager(self, *args, **kwargs):
+# /etc/sysctl.conf
+#  net.ipv4.tcp_keepalive_time = 60
+#  net.ipv4.tcp_keepalive_intvl = 30
+#  net.ipv4.tcp_keepalive_probes = 3
+# # sysctl -p
+        from urllib3.connection import HTTPConnection
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super(TCPKeepAliveAdapter, self).init_poolmanager(*args, **kwargs)
+
+class CookieBlockAllPolicy(cookiejar.CookiePolicy):
+    return_ok = set_ok = domain_return_ok = path_return_ok = lambda self, *args, **kwargs: False
+    netscape = True
+    rfc2965 = hide_cookie2 = False
+
+
+def new_session(pool_maxsize=10):
+    # retries are made by API with its RetryPolicy, which knows which requests are safe to repeat
+    ses = requests.Session()
+    adapter = TCPKeepAliveAdapter(pool_maxsize=pool_maxsize, max_retries=0)
+    ses.mount("https://", adapter)
+    ses.mount("http://", adapter)
+    ses.cookies.set_policy(CookieBlockAllPolicy())
+    return ses
+
+
+class ConnectionPool(object):
+    """
+    Keep-alive HTTP connection pool shared by API objects and threads
+
+    ConnectionPool(pool_maxsize=10, idle_timeout=60)
+
+    Connections are reused across requests, so a call costs one round trip
+    instead of a new TCP+TLS handshake. Connections that were dropped by the
+    server are detected and replaced when they are checked out. A process
+    forked from the owner of a pool starts with no connections.
+
+    Parameters:
+        - pool_maxsize -- maximum number of connections kept per host
+        - idle_timeout -- seconds after which an unused pool is emptied
+                          (default: 60). None disables idle eviction.
+    """
+
+    _shared = None
+    _shared_lock = Lock()
+
+    def __init__(self, pool_maxsize=10, idle_timeout=60):
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self.last_used = 0.0
+        self._lock = Lock()
+        self._sess = None
+        self._pid = os.getpid()
+
+    @classmethod
+    def shared(cls):
+        """
+        return the process-wide pool used by API objects without their own session
+        """
+        with cls._shared_lock:
+            if ConnectionPool._shared is None:
+                ConnectionPool._shared = ConnectionPool()
+            return ConnectionPool._shared
+
+    def __reduce__(self):
+        return ConnectionPool, (self.pool_maxsize, self.idle_timeout)
+
+    def session(self):
+        """
+        return the pooled requests.Session, evicting connections idle for too long
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        with self._lock:
+            now = time.monotonic()
+            if self._sess is None:
+                self._sess = new_session(self.pool_maxsize)
+            elif self.idle_timeout is not None and now - self.last_used > self.idle_timeout:
+                # Session.close() empties the connection pools; the session stays usable
+                self._sess.close()
+            self.last_used = now
+            return self._sess
+
+    def ping(self, url="https://api.bitflyer.com/v1/gethealth", timeout=None):
+        """
+        send a request over the pool and return its round trip time in seconds
+        """
+        start = time.monotonic()
+        self.session().get(url, timeout=timeout).close()
+        return time.monotonic() - start
+
+    def warmup(self, connections=1, url="https://api.bitflyer.com/v1/gethealth", timeout=None):
+        """
+        open `connections` connections in parallel so that the next requests skip the handshake
+
+        Returns the round trip time of each ping, None for those that failed.
+        """
+        times = [None] * min(connections, self.pool_maxsize)
+
+        def warm(i):
+            try:
+                times[i] = self.ping(url, timeout)
+            except requests.RequestException:
+                pass
+
+        threads = [Thread(target=warm, args=(i,), daemon=True) for i in range(len(times))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return times
+
+    def _after_fork(self):
+        # the child must neither use nor close the parent's sockets (closing
+        # a TLS connection would write to the parent's stream); drop them
+        self._lock = Lock()
+        self._sess = None
+        self._pid = os.getpid()
+
+    def close(self):
+        """
+        close all pooled connections
+        """
+        with self._lock:
+            if self._sess:
+                self._sess.close()
+                self._sess = None
+
+
+def _reset_shared():
+    ConnectionPool._shared_lock = Lock()
+    ConnectionPool._shared = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_shared)
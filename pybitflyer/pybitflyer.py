@@ -1,65 +1,150 @@
 # -*- coding: utf-8 -*-
+import os
 import sys
-import json
-import requests
 import time
-import hmac
-import hashlib
+import threading
+import zlib
 import urllib
-from .exception import AuthException, APIException
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-from threading import Lock
-from http import cookiejar
-import socket
-import time
+import contextvars
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait
+from .exception import AuthException, APIException, RateLimitException, DeadlineExceeded
+from . import models
+from .codec import get_codec
+from .signer import Signer, HEADERS
+from .pool import ConnectionPool, new_session
+# moved to pool.py; still importable from here for existing code
+from .pool import TCPKeepAliveAdapter, CookieBlockAllPolicy  # noqa: F401
+from .retry import RetryPolicy
+from .stream import iter_rows, iter_board
+
+# the _Deadline of the batch call running in the current thread or task
+_deadline = contextvars.ContextVar("pybitflyer_deadline", default=None)
+
+# a list collecting the crc32 of every successful response body read in the
+# current context, for callers that detect unchanged responses (MarketDataPoller)
+_body_crc = contextvars.ContextVar("pybitflyer_body_crc", default=None)
+
+
+class _Deadline(object):
+    """
+    absolute deadline of one call of send_orders or cancel_orders
+    """
+
+    def __init__(self, at):
+        self.at = at
+        self.sent = False
+        self._lock = threading.Lock()
 
-class TCPKeepAliveAdapter(HTTPAdapter):
-    def __init__(self, **kwargs):
-        super(TCPKeepAliveAdapter, self).__init__(**kwargs)
-    def init_poolmanager(self, *args, **kwargs):
-# /etc/sysctl.conf
-#  net.ipv4.tcp_keepalive_time = 60
-#  net.ipv4.tcp_keepalive_intvl = 30
-#  net.ipv4.tcp_keepalive_probes = 3
-# # sysctl -p
-        from urllib3.connection import HTTPConnection
-        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
-            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
-        ]
-        super(TCPKeepAliveAdapter, self).init_poolmanager(*args, **kwargs)
-
-class CookieBlockAllPolicy(cookiejar.CookiePolicy):
-    return_ok = set_ok = domain_return_ok = path_return_ok = lambda self, *args, **kwargs: False
-    netscape = True
-    rfc2965 = hide_cookie2 = False
+    def remaining(self):
+        return max(self.at - time.monotonic(), 0.0)
+
+    def send(self, endpoint):
+        # checked right before the request is sent
+        with self._lock:
+            if time.monotonic() >= self.at:
+                raise DeadlineExceeded(endpoint, self.sent)
+            self.sent = True
+
+    def expire(self):
+        """
+        end the call now: nothing is sent from here on; return whether a request was sent
+        """
+        with self._lock:
+            self.at = min(self.at, time.monotonic())
+            return self.sent
 
 class API(object):
     """
     Python API for bitFlyer
 
-    API(api_key=None, api_secret=None, keep_session=False)
+    API(api_key=None, api_secret=None, keep_session=False, pool=None)
 
     Parameters:
         - api_key -- api key
         - api_secret -- api secret
         - keep_session -- whether to keep session (default: False). If True,
-                          API object keeps HTTP session.
+                          API object keeps its own HTTP session.
+        - retry -- number of retries, or a RetryPolicy (default: 0). Orders
+                   and withdrawals are retried only when they provably did
+                   not reach the exchange.
+        - pool -- ConnectionPool used when keep_session is False
+                  (default: the process-wide shared pool).
+        - concurrency -- ConcurrencyController limiting requests in flight
+                         per endpoint and category (default: None).
+        - rate_limiter -- RateLimiter pacing requests within the exchange's
+                          request budgets (default: None).
+        - typed -- whether to return compact models from pybitflyer.models
+                   (Ticker, ExecutionList, Board, ChildOrder, ...) instead of
+                   dicts for the endpoints that have one (default: False).
+        - codec -- JSON codec or its name ("orjson", "ujson", "json").
+                   Defaults to the fastest installed one.
+        - cache -- ResponseCache for slow-changing endpoints (default: None).
+        - metrics -- Metrics recording counts, status codes, retries and
+                     latency of every request (default: None).
+        - hedge -- HedgePolicy sending a second request when a latency-critical
+                   read is slow (default: None).
+        - health -- HealthMonitor scaling concurrency and timeouts to the
+                    exchange's health and holding orders while it does not
+                    accept them (default: None).
+        - order_lane -- OrderLane whose dedicated, pre-warmed connections
+                        carry orders and cancels (default: None).
+
+    API objects can be pickled, e.g. into multiprocessing workers. The copy
+    has the same configuration and opens its own connections; a lock is
+    replaced by a new one, and the metrics, cache and hedge statistics of the
+    copy start empty. After fork() the child opens new connections too.
+    An API with a shared RateLimiter can only be sent to a worker when it
+    starts, like the limiter itself (see RateLimiter).
     """
 
     api_url = "https://api.bitflyer.com"
 
     def __init__(self, api_key=None, api_secret=None,
                  keep_session=False, timeout=None,
-                 lock=None, logger=None, retry=0):
-        self.retry = retry
+                 lock=None, logger=None, retry=0, pool=None,
+                 concurrency=None, rate_limiter=None, typed=False, codec=None,
+                 cache=None, metrics=None, hedge=None, health=None, order_lane=None):
+        self.order_lane = order_lane
+        self.health = health
+        if health is not None:
+            health.attach(self)
+        self.hedge = hedge
+        self.metrics = metrics
+        self.cache = cache
+        self.codec = codec if hasattr(codec, "loads") else get_codec(codec)
+        self.typed = typed
+        self.retry = retry if isinstance(retry, RetryPolicy) else RetryPolicy(total=retry)
+        self.pool = pool
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
         self.api_key = api_key
         self.api_secret = api_secret
+        self.signer = Signer(api_key, api_secret) if api_key and api_secret else None
         self.timeout = timeout
         self.lock = lock
         self.logger = logger
         self.keep_session = keep_session
         self.sess = self._new_session() if keep_session else None
+        self._pid = os.getpid()
+
+    def __getstate__(self):
+        # sessions and locks stay in their process; the configuration is carried over
+        state = self.__dict__.copy()
+        state["sess"] = None
+        state["lock"] = self.lock is not None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = self._new_lock() if state["lock"] else None
+        self.sess = self._new_session() if self.keep_session else None
+        self._pid = os.getpid()
+        if self.health is not None:
+            self.health.attach(self)
+
+    def _new_lock(self):
+        return threading.Lock()
 
     def __enter__(self):
         return self
@@ -68,91 +153,266 @@ class API(object):
         self.close()
 
     def _new_session(self):
-        ses = requests.Session()
-        if self.retry > 0:
-            retry = Retry(total=self.retry,
-                          read=self.retry,
-                          connect=self.retry,
-                          backoff_factor=0.2,
-                          status_forcelist=[500, 502, 504],
-                          method_whitelist=frozenset(['GET', 'POST']))
-            ses.mount(API.api_url, TCPKeepAliveAdapter(max_retries=retry))
-        ses.cookies.set_policy(CookieBlockAllPolicy())
-        return ses
+        return new_session()
+
+    def _pool(self):
+        return self.pool or ConnectionPool.shared()
 
     def close(self):
         """
         close HTTP session
 
-        If set 'keep_session' False, nothing happens when called.
+        If set 'keep_session' False, nothing happens when called; pooled
+        connections are kept for other requests.
         """
         if self.sess:
             self.sess.close()
             self.sess = None
 
     def _request(self, endpoint, method="GET", params=None):
-        if self.lock is None:
-            return self.__request(endpoint, method, params)
+        if self.cache is not None and method == "GET" and self.cache.ttl(endpoint):
+            key = self.cache.key(self.api_key, endpoint, params)
+            return self.cache.get(key, lambda: self._hedged_request(endpoint, method, params))
+        return self._hedged_request(endpoint, method, params)
+
+    def _hedged_request(self, endpoint, method="GET", params=None):
+        if self.hedge is not None and self.hedge.covers(endpoint, method):
+            return self.hedge.run(endpoint, lambda: self._retried_request(endpoint, method, params))
+        return self._retried_request(endpoint, method, params)
+
+    def _retried_request(self, endpoint, method="GET", params=None):
+        # every attempt takes rate budget and a concurrency slot of its own;
+        # backoffs hold neither, nor the lock
+        policy = self.retry
+        begin = time.monotonic()
+        attempt = 0
+        delay = None
+        while True:
+            try:
+                response, content = self._limited_request(endpoint, method, params, begin, attempt)
+            except Exception as e:
+                if policy.should_retry(endpoint, method, attempt, error=e):
+                    delay = policy.backoff(delay)
+                    if self.__sleep(policy, begin, delay):
+                        attempt += 1
+                        continue
+                raise
+            if (response.status_code != 200 and
+                    policy.should_retry(endpoint, method, attempt, response.status_code, content)):
+                delay = policy.backoff(delay, response.headers)
+                if self.__sleep(policy, begin, delay):
+                    attempt += 1
+                    continue
+            break
+
+        if response.status_code != 200:
+            raise APIException(endpoint, method, response.status_code, content, params)
+
+        if self.typed:
+            return models.convert(endpoint, content)
+        return content
+
+    def _limited_request(self, endpoint, method, params, begin, attempt):
+        with self._admission(endpoint, begin):
+            return self.__request(endpoint, method, params, begin, attempt)
+
+    @contextmanager
+    def _admission(self, endpoint, begin):
+        """
+        wait for the exchange's health, rate budget, a concurrency slot and
+        the lock, and hold the slot and the lock for one attempt
+
+        Every wait ends at the retry deadline of the call, and within a batch
+        at the deadline of the batch call.
+        """
+        if self.health is not None:
+            self.health.check(endpoint, self._wait_timeout(endpoint, begin))
+        if self.rate_limiter is not None:
+            timeout = self._wait_timeout(endpoint, begin)
+            try:
+                self.rate_limiter.acquire(endpoint, timeout=timeout)
+            except RateLimitException:
+                if timeout is None or not self.rate_limiter.block:
+                    raise
+                raise _deadline_exceeded(endpoint) from None
+        if self.concurrency is None:
+            slot = nullcontext()
         else:
+            slot = self.concurrency.slot(endpoint, self._wait_timeout(endpoint, begin))
+        with slot, self._locked(endpoint, begin):
+            yield
+
+    @contextmanager
+    def _locked(self, endpoint, begin):
+        if self.lock is None:
+            yield
+            return
+        timeout = self._wait_timeout(endpoint, begin)
+        if timeout is None:
             with self.lock:
-                return self.__request(endpoint, method, params)
+                yield
+        else:
+            if not self.lock.acquire(timeout=timeout):
+                raise _deadline_exceeded(endpoint)
+            try:
+                yield
+            finally:
+                self.lock.release()
 
-    def __request(self, endpoint, method="GET", params=None):
-        url = self.api_url + endpoint
-        body = ""
-        header = {"Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"}
+    def _wait_timeout(self, endpoint, begin):
+        """
+        return the seconds left to wait for admission, or None without a
+        deadline; raise DeadlineExceeded if there are none
+        """
+        remaining = self.retry.remaining(begin)
+        deadline = _deadline.get()
+        if deadline is not None:
+            remaining = deadline.remaining() if remaining is None else min(remaining, deadline.remaining())
+        if remaining is not None and remaining <= 0:
+            raise _deadline_exceeded(endpoint)
+        return remaining
+
+    def _prepare(self, endpoint, method="GET", params=None):
+        """
+        return the path, body and headers of a request
+
+        The body is serialized once and the same bytes are signed and sent.
+        """
+        path = endpoint
+        body = b""
 
         if method == "POST":
-            body = json.dumps(params)
+            body = self.codec.dumps(params)
         else:
             if params:
-                body = "?" + urllib.parse.urlencode(params)
-
-        if self.api_key and self.api_secret:
-            access_timestamp = str(time.time())
-            api_secret = str.encode(self.api_secret)
-            text = str.encode(access_timestamp + method + endpoint + body)
-            access_sign = hmac.new(api_secret,
-                                   text,
-                                   hashlib.sha256).hexdigest()
-            header.update({
-                "ACCESS-KEY": self.api_key,
-                "ACCESS-TIMESTAMP": access_timestamp,
-                "ACCESS-SIGN": access_sign})
-
-        sess = self.sess or self._new_session()
+                path = endpoint + "?" + urllib.parse.urlencode(params)
+
+        if self.signer is not None:
+            header = self.signer.headers(method, path, body)
+        else:
+            header = HEADERS
+        return path, body, header
+
+    def _timeout(self, endpoint, remaining):
+        """
+        return the request timeout, widened for the exchange's health and
+        shortened to the remaining retry deadline; raise DeadlineExceeded if
+        nothing remains of it
+        """
+        if remaining is not None and remaining <= 0:
+            raise _deadline_exceeded(endpoint)
+        timeout = self.timeout
+        if self.health is not None:
+            timeout = self.health.scale_timeout(timeout)
+        if remaining is None:
+            return timeout
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(min(t, remaining) if t is not None else remaining for t in timeout)
+        return min(timeout, remaining)
+
+    def __send(self, endpoint, method, params, timeout, stream=False):
+        # a new signature (and timestamp) for every attempt
+        path, body, header = self._prepare(endpoint, method, params)
+        url = self.api_url + path
+
+        lane = self.order_lane
+        if lane is not None and not lane.covers(endpoint):
+            lane = None
+        if lane is not None:
+            sess = lane.session()
+        else:
+            if self.sess is not None and self._pid != os.getpid():
+                # forked: the parent's connections must not be used, nor closed
+                self.sess = self._new_session()
+                self._pid = os.getpid()
+            sess = self.sess or self._pool().session()
+        deadline = _deadline.get()
+        if deadline is not None:
+            deadline.send(endpoint)
         try:
             if method == "GET":
-                response = sess.get(url, params=params, timeout=self.timeout, headers=header)
+                response = sess.get(url, timeout=timeout, headers=header, stream=stream)
             else:  # method == "POST":
-                response = sess.post(url, data=json.dumps(params), headers=header, timeout=self.timeout)
-        except:
+                response = sess.post(url, data=body, headers=header, timeout=timeout)
+        except Exception:
             if self.logger:
                 self.logger.error("Error: {}".format(sys.exc_info()[0]))
-            if self.sess:
+            if self.sess and lane is None:
                 self.sess.close()
                 self.sess = self._new_session()
             raise
-        finally:
-            if not self.keep_session:
-                sess.close()
-            elif self.sess is None:
-                self.sess = sess
+        if lane is not None:
+            lane.record(response.elapsed.total_seconds())
+        return response
 
+    def __decode(self, response):
         content = ""
+        if response.status_code != 200:
+            # error pages need not be JSON; their status decides the retry
+            return self.__error_body(response.content)
         if len(response.content) > 0:
             try:
-                content = json.loads(response.content.decode("utf-8"))
-            except json.decoder.JSONDecodeError:
+                content = self.codec.loads(response.content)
+            except ValueError:
                 if self.logger:
                     self.logger.error("JSON Decode Error: {}".format(response.content))
                 raise
-        
-        if response.status_code != 200:
-            raise APIException(endpoint, method, response.status_code, content, params)
-        
         return content
 
+    def __error_body(self, content):
+        try:
+            return self.codec.loads(content) if content else None
+        except ValueError:
+            return None
+
+    def __request(self, endpoint, method, params, begin, attempt):
+        """
+        send one attempt of a request; return the response and its decoded content
+        """
+        metrics = self.metrics
+        timeout = self._timeout(endpoint, self.retry.remaining(begin))
+        if metrics is not None:
+            start = time.perf_counter()
+        try:
+            response = self.__send(endpoint, method, params, timeout)
+            if metrics is not None:
+                received = time.perf_counter()
+            content = self.__decode(response)
+        except Exception as e:
+            if metrics is not None:
+                metrics.record_error(endpoint, method, e)
+            raise
+
+        if metrics is not None:
+            end = time.perf_counter()
+            wait = response.elapsed.total_seconds()
+            metrics.record(endpoint, method, response.status_code, {
+                "wait": wait,
+                "transfer": max(received - start - wait, 0.0),
+                "decode": end - received,
+                "total": end - start,
+            }, 1 if attempt else 0)
+        if response.status_code == 200:
+            crcs = _body_crc.get()
+            if crcs is not None:
+                crcs.append(zlib.crc32(response.content))
+        return response, content
+
+    def __sleep(self, policy, begin, delay):
+        """
+        sleep before a retry; return False if the retry would miss the deadline
+        """
+        remaining = policy.remaining(begin)
+        if remaining is not None and delay >= remaining:
+            return False
+        deadline = _deadline.get()
+        if deadline is not None and delay >= deadline.remaining():
+            return False
+        time.sleep(delay)
+        return True
+
     """HTTP Public API"""
 
     def markets(self, **params):
@@ -941,3 +1201,193 @@ Additional fees apply for withdrawals. Please see the Fees and Taxes page for re
 
         endpoint = "/v1/me/gettradingcommission"
         return self._request(endpoint, params=params)
+
+    """Batch API"""
+
+    def send_orders(self, orders, deadline=None, max_workers=10):
+        """Send New Orders in Parallel
+
+        Parameters
+        ----------
+        orders: List of order parameters. Orders with "parameters" are sent with sendparentorder, the others with sendchildorder.
+        deadline: Seconds allowed for all orders. No order is sent after it, and waits for rate budget, health and concurrency slots end at it.
+        max_workers: Maximum number of orders in flight.
+
+        Response
+        --------
+        List of the response or the raised exception of each order, in input order.
+        Orders unanswered at the deadline get a DeadlineExceeded (a TimeoutError) whose sent attribute is False if the order was never sent, and True if it was in flight and may have been accepted.
+        """
+        return self._batch([(self.sendparentorder if "parameters" in o else self.sendchildorder, o)
+                            for o in orders], deadline, max_workers)
+
+    def cancel_orders(self, orders, deadline=None, max_workers=10):
+        """Cancel Orders in Parallel
+
+        Parameters
+        ----------
+        orders: List of cancel parameters. Orders with parent_order_id or parent_order_acceptance_id are canceled with cancelparentorder, the others with cancelchildorder.
+        deadline: Seconds allowed for all cancels. No cancel is sent after it.
+        max_workers: Maximum number of cancels in flight.
+
+        Response
+        --------
+        List of the response or the raised exception of each cancel, in input order, with DeadlineExceeded as in send_orders.
+        """
+        return self._batch([(self.cancelparentorder if _is_parent(o) else self.cancelchildorder, o)
+                            for o in orders], deadline, max_workers)
+
+    def _batch(self, calls, deadline, max_workers):
+        if not calls:
+            return []
+        at = None if deadline is None else time.monotonic() + deadline
+        deadlines = [None if at is None else _Deadline(at) for _ in calls]
+
+        def call(method, params, deadline):
+            token = _deadline.set(deadline)
+            try:
+                return method(**params)
+            except DeadlineExceeded as e:
+                # a retry may have been refused after an earlier attempt was sent
+                if deadline is None or e.sent == deadline.sent:
+                    raise
+                raise DeadlineExceeded(e.endpoint, deadline.sent) from None
+            finally:
+                _deadline.reset(token)
+
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(calls)))
+        try:
+            futures = [executor.submit(call, method, params, d)
+                       for (method, params), d in zip(calls, deadlines)]
+            wait(futures, timeout=deadline)
+            results = []
+            for (method, _), future, d in zip(calls, futures, deadlines):
+                if not future.done():
+                    sent = d.expire()
+                    if not future.done():  # it may have finished meanwhile
+                        future.cancel()
+                        results.append(DeadlineExceeded(_endpoint(method), sent))
+                        continue
+                if future.exception() is not None:
+                    results.append(future.exception())
+                else:
+                    results.append(future.result())
+            return results
+        finally:
+            executor.shutdown(wait=False)
+
+    """Streaming API"""
+
+    def executions_stream(self, **params):
+        """Execution History, Streamed
+
+        Parameters
+        ----------
+        Those of executions.
+
+        Response
+        --------
+        Iterator of the executions (dicts), yielded while the response is
+        still being received. The request is sent on the first iteration,
+        limited and retried like executions; its concurrency slot and the
+        lock are held until the iterator is exhausted or closed.
+        pybitflyer.stream.fill_executions writes them into NumPy arrays.
+        """
+        return self._stream("/v1/executions", params, iter_rows)
+
+    def board_stream(self, **params):
+        """Order Book, Streamed
+
+        Parameters
+        ----------
+        Those of board.
+
+        Response
+        --------
+        Iterator of ("mid_price", price), ("bids", level) and ("asks", level),
+        yielded while the response is still being received. The request is
+        sent on the first iteration, and limited and retried like board.
+        pybitflyer.stream.fill_board writes the levels into NumPy arrays.
+        """
+        return self._stream("/v1/board", params, iter_board)
+
+    def _stream(self, endpoint, params, parse):
+        # the same admission, fork check and retries as _request; a request
+        # is retried only until its rows start to arrive
+        policy = self.retry
+        begin = time.monotonic()
+        attempt = 0
+        delay = None
+        while True:
+            with self._admission(endpoint, begin):
+                start = time.perf_counter()
+                response, content, error = self.__open_stream(endpoint, params, begin, attempt, start)
+                if response is not None and response.status_code == 200:
+                    yield from self.__read_stream(endpoint, response, parse, attempt, start)
+                    return
+            if error is not None:
+                if policy.should_retry(endpoint, "GET", attempt, error=error):
+                    delay = policy.backoff(delay)
+                    if self.__sleep(policy, begin, delay):
+                        attempt += 1
+                        continue
+                raise error
+            if policy.should_retry(endpoint, "GET", attempt, response.status_code, content):
+                delay = policy.backoff(delay, response.headers)
+                if self.__sleep(policy, begin, delay):
+                    attempt += 1
+                    continue
+            raise APIException(endpoint, "GET", response.status_code, content, params)
+
+    def __open_stream(self, endpoint, params, begin, attempt, start):
+        # return (response, error content, exception) of one attempt
+        metrics = self.metrics
+        try:
+            response = self.__send(endpoint, "GET", params,
+                                   self._timeout(endpoint, self.retry.remaining(begin)), stream=True)
+        except Exception as e:
+            if metrics is not None:
+                metrics.record_error(endpoint, "GET", e)
+            return None, None, e
+        if response.status_code == 200:
+            return response, None, None
+        try:
+            content = self.__decode(response)
+        finally:
+            response.close()
+            if metrics is not None:
+                total = time.perf_counter() - start
+                metrics.record(endpoint, "GET", response.status_code,
+                               {"wait": response.elapsed.total_seconds(), "total": total},
+                               1 if attempt else 0)
+        return response, content, None
+
+    def __read_stream(self, endpoint, response, parse, attempt, start):
+        metrics = self.metrics
+        try:
+            # decode_content unzips gzip as it arrives
+            for item in parse(response.raw.stream(65536, decode_content=True)):
+                yield item
+        finally:
+            response.close()
+            if metrics is not None:
+                wait = response.elapsed.total_seconds()
+                total = time.perf_counter() - start
+                metrics.record(endpoint, "GET", response.status_code,
+                               {"wait": wait, "transfer": max(total - wait, 0.0), "total": total},
+                               1 if attempt else 0)
+
+
+def _deadline_exceeded(endpoint):
+    # within a batch, whether the call sent a request; _batch reports that too
+    deadline = _deadline.get()
+    return DeadlineExceeded(endpoint, deadline is not None and deadline.sent)
+
+
+def _endpoint(method):
+    # batch methods are the private endpoints of the same name
+    return "/v1/me/" + method.__name__
+
+
+def _is_parent(params):
+    return "parent_order_id" in params or "parent_order_acceptance_id" in params
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+import time
+import multiprocessing
+from collections import deque
+from threading import Lock
+from .exception import RateLimitException
+from .endpoints import PUBLIC, ORDER_ENDPOINTS, category
+
+
+class SlidingWindow(object):
+    """
+    Sliding window log allowing `limit` requests in any `period` seconds
+
+    SlidingWindow(limit, period)
+    """
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self._log = deque()
+
+    def _prune(self, now):
+        log = self._log
+        while log and log[0] <= now - self.period:
+            log.popleft()
+
+    def remaining(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._prune(now)
+        return self.limit - len(self._log)
+
+    def wait_time(self, now=None):
+        """
+        seconds until one more request fits in the window
+        """
+        now = time.monotonic() if now is None else now
+        self._prune(now)
+        if len(self._log) < self.limit:
+            return 0.0
+        return self._log[len(self._log) - self.limit] + self.period - now
+
+    def consume(self, now=None):
+        self._log.append(time.monotonic() if now is None else now)
+
+
+class SharedSlidingWindow(object):
+    """
+    SlidingWindow kept in shared memory, for limiters shared by processes
+
+    SharedSlidingWindow(limit, period, context=None)
+
+    The times of the last `limit` requests are a ring buffer in a
+    multiprocessing.Array. time.monotonic() is system-wide, so times taken by
+    different processes compare. Guard it with a multiprocessing lock.
+    """
+
+    def __init__(self, limit, period, context=None):
+        context = context or multiprocessing
+        self.limit = limit
+        self.period = period
+        self._times = context.RawArray("d", [float("-inf")] * limit)
+        self._head = context.RawValue("l", 0)  # index of the oldest request
+
+    def remaining(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self.limit - sum(1 for t in self._times if t > now - self.period)
+
+    def wait_time(self, now=None):
+        now = time.monotonic() if now is None else now
+        return max(self._times[self._head.value] + self.period - now, 0.0)
+
+    def consume(self, now=None):
+        head = self._head.value
+        self._times[head] = time.monotonic() if now is None else now
+        self._head.value = (head + 1) % self.limit
+
+
+class RateLimiter(object):
+    """
+    Client-side model of bitFlyer's request budgets
+
+    RateLimiter(private=(500, 300), order=(300, 300), ip=(500, 300), block=True)
+
+    Each budget is a (requests, seconds) pair, or None to disable it. Every
+    request counts against the per-IP budget, private API requests against
+    the private budget of the key, and sendchildorder/sendparentorder against
+    the order budget.
+
+    Parameters:
+        - private -- private API budget per API key (default: 500 per 5 minutes)
+        - order -- order placement budget (default: 300 per 5 minutes)
+        - ip -- budget for all requests from this IP (default: 500 per 5 minutes)
+        - block -- if True, wait until the budget allows the request. If False,
+                   raise RateLimitException immediately (default: True).
+        - shared -- if True, keep the budgets in shared memory so that
+                    worker processes started with this limiter (and APIs
+                    using it) draw from the same budgets (default: False).
+                    Pass it, or an API holding it, to the workers when they
+                    are started, e.g. as an argument of multiprocessing.Process
+                    or of a Pool initializer; sending it later, e.g. as an
+                    argument of Pool.map, raises RuntimeError because its lock
+                    can only be inherited. An unshared limiter arrives in
+                    another process with fresh budgets.
+        - context -- multiprocessing context of a shared limiter
+    """
+
+    def __init__(self, private=(500, 300), order=(300, 300), ip=(500, 300), block=True,
+                 shared=False, context=None):
+        self.block = block
+        self.shared = shared
+        self.context = context
+        self.budgets = {"private": private, "order": order, "ip": ip}
+        if shared:
+            self._lock = (context or multiprocessing).Lock()
+            window = lambda limit, period: SharedSlidingWindow(limit, period, context)
+        else:
+            self._lock = Lock()
+            window = SlidingWindow
+        self.windows = {name: window(*budget)
+                        for name, budget in self.budgets.items()
+                        if budget is not None}
+
+    def __reduce__(self):
+        if self.shared:
+            # shared memory and the lock are inherited by child processes
+            state = self.__dict__.copy()
+            state.pop("context")
+            return _restore, (state,)
+        return RateLimiter, (self.budgets["private"], self.budgets["order"], self.budgets["ip"],
+                             self.block)
+
+    def derive(self):
+        """
+        return a limiter for another API key from the same IP
+
+        It has its own private and order budgets and shares the per-IP budget
+        (and the lock guarding it) with this limiter.
+        """
+        limiter = RateLimiter(private=self.budgets["private"], order=self.budgets["order"],
+                              ip=None, block=self.block, shared=self.shared, context=self.context)
+        limiter._lock = self._lock
+        limiter.budgets["ip"] = self.budgets["ip"]
+        if "ip" in self.windows:
+            limiter.windows["ip"] = self.windows["ip"]
+        return limiter
+
+    def _budgets(self, endpoint):
+        names = ["ip"]
+        if category(endpoint) != PUBLIC:
+            names.append("private")
+        if endpoint in ORDER_ENDPOINTS:
+            names.append("order")
+        return [(n, self.windows[n]) for n in names if n in self.windows]
+
+    def acquire(self, endpoint, block=None, timeout=None):
+        """
+        take budget for one request to `endpoint`
+
+        Blocks until budget is available unless block is False, in which case
+        RateLimitException is raised. With a timeout, RateLimitException is
+        raised if the budget does not free up in time.
+        """
+        block = self.block if block is None else block
+        budgets = self._budgets(endpoint)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                name, wait = max(((n, w.wait_time(now)) for n, w in budgets),
+                                 key=lambda x: x[1], default=(None, 0.0))
+                if wait <= 0:
+                    for _, w in budgets:
+                        w.consume(now)
+                    return
+            if not block or (deadline is not None and now + wait > deadline):
+                raise RateLimitException(endpoint, name, wait)
+            time.sleep(wait)
+
+    def remaining(self):
+        """
+        return the number of requests left in each budget, e.g. {"private": 480, "order": 300, "ip": 470}
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {name: w.remaining(now) for name, w in self.windows.items()}
+
+
+def _restore(state):
+    limiter = RateLimiter.__new__(RateLimiter)
+    limiter.__dict__.update(state, context=None)
+    return limiter
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+import sys
+import json
+import time
+import hmac
+import asyncio
+import hashlib
+import secrets
+import itertools
+from .exception import AuthException
+
+PRIVATE_CHANNELS = frozenset(["child_order_events", "parent_order_events"])
+
+
+def board_snapshot_channel(product_code):
+    return "lightning_board_snapshot_" + product_code
+
+
+def board_channel(product_code):
+    return "lightning_board_" + product_code
+
+
+def ticker_channel(product_code):
+    return "lightning_ticker_" + product_code
+
+
+def executions_channel(product_code):
+    return "lightning_executions_" + product_code
+
+
+class RealtimeAPI(object):
+    """
+    Realtime API (JSON-RPC 2.0 over WebSocket) for bitFlyer
+
+    RealtimeAPI(api_key=None, api_secret=None, url="wss://ws.lightstream.bitflyer.com/json-rpc",
+                reconnect_delay=1, max_reconnect_delay=60, logger=None)
+
+    Subscriptions survive reconnects: after the connection drops, the client
+    reconnects with exponential backoff, authenticates again and resubscribes
+    to every channel. Messages are delivered to callbacks, to messages()
+    iterators, or both.
+
+        rt = RealtimeAPI(api_key="xxx...", api_secret="yyy...")
+        rt.subscribe(ticker_channel("BTC_JPY"), print)
+        rt.subscribe("child_order_events", on_order)
+        rt.run_forever()
+
+    Requires websockets.
+
+    Parameters:
+        - api_key -- api key, required for child_order_events and parent_order_events
+        - api_secret -- api secret
+        - url -- endpoint URL, e.g. a local mock server in tests
+        - reconnect_delay -- initial delay in seconds before reconnecting
+        - max_reconnect_delay -- maximum delay in seconds before reconnecting
+        - logger -- logger used to report connection errors
+    """
+
+    url = "wss://ws.lightstream.bitflyer.com/json-rpc"
+
+    def __init__(self, api_key=None, api_secret=None, url=None,
+                 reconnect_delay=1, max_reconnect_delay=60, logger=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        if url is not None:
+            self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.logger = logger
+        self.callbacks = {}
+        self._queues = []
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._tasks = set()
+        self._ws = None
+        self._loop = None
+        self._closed = False
+
+    def subscribe(self, channel, callback=None):
+        """
+        subscribe to a channel; callback(message) may be a function or a coroutine function
+
+        Coroutine callbacks run as tasks, concurrently with the reader.
+        Exceptions raised by callbacks are logged and do not stop run().
+        """
+        if channel in PRIVATE_CHANNELS and not all([self.api_key, self.api_secret]):
+            raise AuthException()
+        new = channel not in self.callbacks
+        callbacks = self.callbacks.setdefault(channel, [])
+        if callback is not None:
+            callbacks.append(callback)
+        if new:
+            self._submit(self._call("subscribe", {"channel": channel}))
+
+    def unsubscribe(self, channel):
+        if self.callbacks.pop(channel, None) is not None:
+            self._submit(self._call("unsubscribe", {"channel": channel}))
+
+    def _submit(self, coro):
+        if self._ws is None or self._loop is None:
+            coro.close()
+            return
+        asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def messages(self, maxsize=10000):
+        """
+        async iterator of (channel, message) for every subscribed channel
+
+        When the consumer falls behind by more than maxsize messages, the oldest are dropped.
+        """
+        queue = asyncio.Queue(maxsize)
+        self._queues.append(queue)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self._queues.remove(queue)
+
+    async def _call(self, method, params):
+        id_ = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[id_] = future
+        try:
+            await self._ws.send(json.dumps({"jsonrpc": "2.0", "method": method,
+                                            "params": params, "id": id_}))
+            return await future
+        finally:
+            self._pending.pop(id_, None)
+
+    def _auth_params(self):
+        timestamp = int(time.time() * 1000)
+        nonce = secrets.token_hex(16)
+        signature = hmac.new(str.encode(self.api_secret),
+                             str.encode(f"{timestamp}{nonce}"),
+                             hashlib.sha256).hexdigest()
+        return {"api_key": self.api_key, "timestamp": timestamp,
+                "nonce": nonce, "signature": signature}
+
+    async def _dispatch(self, data):
+        if "id" in data and data.get("method") is None:
+            future = self._pending.get(data["id"])
+            if future is not None and not future.done():
+                if "error" in data:
+                    future.set_exception(RuntimeError(data["error"]))
+                else:
+                    future.set_result(data.get("result"))
+            return
+        if data.get("method") != "channelMessage":
+            return
+        channel = data["params"]["channel"]
+        message = data["params"]["message"]
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((channel, message))
+        for callback in list(self.callbacks.get(channel, ())):
+            try:
+                result = callback(message)
+            except Exception:
+                self._callback_error(sys.exc_info()[1])
+                continue
+            if asyncio.iscoroutine(result):
+                # a slow coroutine callback must not stall the reader
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._callback_error(task.exception())
+
+    def _callback_error(self, error):
+        # an error of a callback is reported, never raised into the reader
+        if self.logger:
+            self.logger.error("Error in callback: {}".format(error))
+
+    async def _read(self, ws):
+        try:
+            async for raw in ws:
+                await self._dispatch(json.loads(raw))
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("connection closed"))
+
+    async def _setup(self):
+        if self.api_key and self.api_secret:
+            if not await self._call("auth", self._auth_params()):
+                raise AuthException()
+        for channel in list(self.callbacks):
+            await self._call("subscribe", {"channel": channel})
+
+    async def run(self):
+        """
+        connect and deliver messages until close() is called
+        """
+        try:
+            import websockets
+        except ImportError:
+            raise ImportError("RealtimeAPI requires websockets: pip install websockets")
+
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+        delay = self.reconnect_delay
+        while not self._closed:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    self._ws = ws
+                    reader = asyncio.ensure_future(self._read(ws))
+                    try:
+                        await self._setup()
+                        delay = self.reconnect_delay
+                        await reader
+                    finally:
+                        reader.cancel()
+                        self._ws = None
+            except AuthException:
+                raise
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException, RuntimeError):
+                if self.logger:
+                    self.logger.error("Error: {}".format(sys.exc_info()[1]))
+            if self._closed:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def run_forever(self):
+        """
+        run() in a new event loop, blocking the calling thread
+        """
+        asyncio.run(self.run())
+
+    async def close(self):
+        self._closed = True
+        if self._ws is not None:
+            await self._ws.close()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import time
+import random
+import asyncio
+import requests
+from email.utils import parsedate_to_datetime
+from .endpoints import ORDER_ENDPOINTS
+from .exception import DeadlineExceeded
+
+# POST endpoints whose effect is doubled when a request is repeated
+NON_IDEMPOTENT_ENDPOINTS = ORDER_ENDPOINTS | frozenset(["/v1/me/withdraw"])
+
+# exceptions raised when the connection could not be opened, so the request was never sent
+_CONNECT_ERRORS = frozenset(["ConnectTimeout", "NewConnectionError", "NameResolutionError",
+                             "ConnectTimeoutError", "ClientConnectorError"])
+
+
+def _names(obj):
+    return set(c.__name__ for c in type(obj).__mro__)
+
+
+def is_connect_error(error):
+    """
+    whether the request failed before it reached the server
+    """
+    if _names(error) & _CONNECT_ERRORS:
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return reason is not None and bool(_names(reason) & _CONNECT_ERRORS)
+
+
+def is_transient_error(error):
+    """
+    whether the request failed on the network, as opposed to a bug or a bad response
+    """
+    return (isinstance(error, (requests.RequestException, OSError, asyncio.TimeoutError))
+            or "ClientError" in _names(error))
+
+
+def retry_after(headers):
+    """
+    return the Retry-After header in seconds, or None
+    """
+    value = headers.get("Retry-After") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy(object):
+    """
+    Retries of failed requests
+
+    RetryPolicy(total=3, deadline=None, base=0.1, cap=5, statuses=(429, 500, 502, 503, 504),
+                error_codes=())
+
+    Idempotent requests (GET and the cancel endpoints) are retried on network
+    errors, on the given HTTP statuses and on the given exchange error codes
+    (the "status" field of the error body). sendchildorder, sendparentorder
+    and withdraw are retried only when the request provably did not reach the
+    exchange: when the connection could not be opened, or on 429 Too Many
+    Requests. A retry after any other failure could place an order twice.
+
+    Delays follow the Retry-After header when present, and decorrelated
+    jitter otherwise: uniform(base, 3 * previous delay); either is at most cap.
+    Every retry takes rate budget like a new request, and no concurrency
+    slot or lock is held while waiting for it.
+
+    Parameters:
+        - total -- maximum number of retries per call
+        - deadline -- seconds allowed for a call including all retries, or None.
+                      No retry is started that would end its backoff after it,
+                      request timeouts are shortened to fit it, and waits for
+                      rate budget, a concurrency slot or the lock end at it
+                      with DeadlineExceeded.
+        - base -- minimum delay in seconds
+        - cap -- maximum delay in seconds
+        - statuses -- HTTP statuses retried for idempotent requests
+        - error_codes -- exchange error codes retried for idempotent requests
+    """
+
+    def __init__(self, total=3, deadline=None, base=0.1, cap=5,
+                 statuses=(429, 500, 502, 503, 504), error_codes=()):
+        self.total = total
+        self.deadline = deadline
+        self.base = base
+        self.cap = cap
+        self.statuses = frozenset(statuses)
+        self.error_codes = frozenset(error_codes)
+
+    @staticmethod
+    def is_idempotent(endpoint, method):
+        return method == "GET" or endpoint not in NON_IDEMPOTENT_ENDPOINTS
+
+    def should_retry(self, endpoint, method, attempt, status=None, content=None, error=None):
+        """
+        whether attempt number `attempt` (0 for the first request) may be retried
+        """
+        if attempt >= self.total or isinstance(error, DeadlineExceeded):
+            return False
+        idempotent = self.is_idempotent(endpoint, method)
+        if error is not None:
+            if is_connect_error(error):
+                return True
+            return idempotent and is_transient_error(error)
+        if status == 429:
+            return True
+        if not idempotent:
+            return False
+        if status in self.statuses:
+            return True
+        return (isinstance(content, dict) and content.get("status") in self.error_codes)
+
+    def backoff(self, previous, headers=None):
+        """
+        return the delay before the next attempt, given the previous delay (None at first)
+        """
+        delay = retry_after(headers)
+        if delay is not None:
+            return min(delay, self.cap)
+        previous = previous or self.base
+        return min(self.cap, random.uniform(self.base, previous * 3))
+
+    def remaining(self, start):
+        """
+        seconds left of the deadline of a call started at `start` (time.monotonic()), or None
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - (time.monotonic() - start)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import time
+import hashlib
+
+BLOCK_SIZE = 64  # of SHA-256
+
+HEADERS = {"Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"}
+
+
+class Signer(object):
+    """
+    ACCESS-SIGN request signer
+
+    Signer(api_key, api_secret)
+
+    The HMAC-SHA256 inner and outer hash states keyed with the API secret are
+    computed once and copied for every request, and the headers are filled in
+    from a template. The output is the same as
+    hmac.new(api_secret, timestamp + method + path + body, sha256).
+
+        signer = Signer(api_key, api_secret)
+        timeit.timeit(lambda: signer.headers("POST", "/v1/me/sendchildorder", body))
+
+    Parameters:
+        - api_key -- api key
+        - api_secret -- api secret
+    """
+
+    def __init__(self, api_key, api_secret):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        key = str.encode(api_secret)
+        if len(key) > BLOCK_SIZE:
+            key = hashlib.sha256(key).digest()
+        key = key.ljust(BLOCK_SIZE, b"\0")
+        # the inner and outer hash states of HMAC after absorbing the padded key
+        self._inner = hashlib.sha256(key.translate(bytes(x ^ 0x36 for x in range(256))))
+        self._outer = hashlib.sha256(key.translate(bytes(x ^ 0x5c for x in range(256))))
+        self._template = dict(HEADERS, **{"ACCESS-KEY": api_key})
+
+    def __reduce__(self):
+        # hash states cannot be pickled; they are computed again from the secret
+        return Signer, (self.api_key, self.api_secret)
+
+    def sign(self, timestamp, method, path, body=b""):
+        """
+        return the hex ACCESS-SIGN of a request; path includes the query string
+        """
+        inner = self._inner.copy()
+        inner.update(str.encode(timestamp + method + path))
+        if body:
+            inner.update(body)
+        outer = self._outer.copy()
+        outer.update(inner.digest())
+        return outer.hexdigest()
+
+    def headers(self, method, path, body=b""):
+        """
+        return the headers of a signed request
+        """
+        timestamp = str(time.time())
+        header = self._template.copy()
+        header["ACCESS-TIMESTAMP"] = timestamp
+        header["ACCESS-SIGN"] = self.sign(timestamp, method, path, body)
+        return header
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from datetime import timezone
+from threading import Lock
+from .pagination import paginate
+from .models import field
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+SIDES = {"BUY": 1, "SELL": -1}
+
+COLUMNS = (
+    ("id", "<i8"),
+    ("exec_date", "<i8"),
+    ("price", "<f8"),
+    ("size", "<f8"),
+    ("side", "i1"),
+)
+
+
+def executions_to_columns(executions):
+    """
+    convert executions (dicts or Execution models) to a dict of NumPy arrays in ascending id order
+
+    exec_date is converted to milliseconds since the epoch (UTC) and side to
+    1 (BUY), -1 (SELL) or 0 (Itayose).
+    """
+    executions = sorted(executions, key=lambda e: field(e, "id"))
+    n = len(executions)
+    return {
+        "id": np.fromiter((field(e, "id") for e in executions), "<i8", n),
+        "exec_date": np.array([field(e, "exec_date").rstrip("Z") for e in executions],
+                              dtype="datetime64[ms]").astype("<i8"),
+        "price": np.fromiter((field(e, "price") for e in executions), "<f8", n),
+        "size": np.fromiter((field(e, "size") for e in executions), "<f8", n),
+        "side": np.fromiter((SIDES.get(field(e, "side"), 0) for e in executions), "i1", n),
+    }
+
+
+class ExecutionStore(object):
+    """
+    On-disk archive of public executions (/v1/executions)
+
+    ExecutionStore(path, api=None)
+
+    Each product is stored as one append-only file per column under
+    `path/<product_code>/` (id, exec_date, price, size, side) and read back
+    through NumPy memory maps, so queries never re-parse JSON. Rows are kept
+    in ascending id order, which makes id and time lookups binary searches
+    (exec_date is non-decreasing with id).
+
+    Requires numpy.
+
+        store = ExecutionStore("executions", api)
+        store.sync("BTC_JPY")
+        rows = store.range("BTC_JPY", start="2024-01-01T00:00:00")
+        rows["price"], rows["exec_date"].view("datetime64[ms]")
+
+    Parameters:
+        - path -- directory of the archive
+        - api -- API used by sync()
+    """
+
+    def __init__(self, path, api=None):
+        if np is None:
+            raise ImportError("ExecutionStore requires numpy: pip install numpy")
+        self.path = path
+        self.api = api
+        self._lock = Lock()
+
+    def _file(self, product_code, column):
+        return os.path.join(self.path, product_code, column)
+
+    def _count(self, product_code):
+        try:
+            return os.path.getsize(self._file(product_code, "id")) // 8
+        except FileNotFoundError:
+            return 0
+
+    def columns(self, product_code):
+        """
+        return all stored rows as a dict of read-only memory-mapped arrays
+        """
+        n = self._count(product_code)
+        result = {}
+        for name, dtype in COLUMNS:
+            if n == 0:
+                result[name] = np.empty(0, dtype)
+            else:
+                result[name] = np.memmap(self._file(product_code, name), dtype, "r", shape=(n,))
+        return result
+
+    def last_id(self, product_code):
+        n = self._count(product_code)
+        if n == 0:
+            return None
+        return int(np.memmap(self._file(product_code, "id"), "<i8", "r", offset=(n - 1) * 8, shape=(1,))[0])
+
+    def append(self, product_code, executions):
+        """
+        append executions (dicts from API.executions) newer than the last stored id
+        """
+        cols = executions_to_columns(executions)
+        with self._lock:
+            last = self.last_id(product_code)
+            if last is not None:
+                newer = cols["id"] > last
+                cols = {k: v[newer] for k, v in cols.items()}
+            return self._write(product_code, cols)
+
+    def _write(self, product_code, cols):
+        if len(cols["id"]) == 0:
+            return 0
+        os.makedirs(os.path.join(self.path, product_code), exist_ok=True)
+        n = self._count(product_code)
+        # the id column is written last and defines the row count, so a write
+        # interrupted halfway is discarded by the next one
+        for name, dtype in COLUMNS[1:] + COLUMNS[:1]:
+            with open(self._file(product_code, name), "ab") as f:
+                f.truncate(n * np.dtype(dtype).itemsize)
+                f.write(cols[name].tobytes())
+        return len(cols["id"])
+
+    def sync(self, product_code, since=None):
+        """
+        fetch and store executions newer than the last stored id
+
+        On an empty archive every execution the API still serves is fetched,
+        or only those after `since` (datetime or ISO 8601 string, UTC).
+        Returns the number of rows added.
+        """
+        after = self.last_id(product_code)
+        # pages arrive newest first; they are spilled to temporary column files
+        # and appended oldest first, so memory holds one page at most
+        directory = os.path.join(self.path, product_code)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix=".sync-", dir=directory) as spill:
+            sizes = []
+            page = []
+            for execution in paginate(self.api.executions, product_code=product_code,
+                                      after=after, since=since if after is None else None):
+                page.append(execution)
+                if len(page) == 500:
+                    sizes.append(self._spill(spill, executions_to_columns(page)))
+                    page = []
+            if page:
+                sizes.append(self._spill(spill, executions_to_columns(page)))
+            if not sizes:
+                return 0
+            total = sum(sizes)
+            spilled = dict((name, np.memmap(os.path.join(spill, name), dtype, "r", shape=(total,)))
+                           for name, dtype in COLUMNS)
+            with self._lock:
+                if self.last_id(product_code) != after:
+                    raise RuntimeError("ExecutionStore was modified during sync")
+                added = 0
+                end = total
+                for size in reversed(sizes):
+                    added += self._write(product_code, dict((name, column[end - size:end])
+                                                            for name, column in spilled.items()))
+                    end -= size
+            del spilled
+            return added
+
+    @staticmethod
+    def _spill(directory, cols):
+        for name, _ in COLUMNS:
+            with open(os.path.join(directory, name), "ab") as f:
+                f.write(cols[name].tobytes())
+        return len(cols["id"])
+
+    def ids(self, product_code, start_id=None, end_id=None):
+        """
+        return rows with start_id <= id < end_id as a dict of arrays
+        """
+        cols = self.columns(product_code)
+        lo = 0 if start_id is None else int(np.searchsorted(cols["id"], start_id, "left"))
+        hi = len(cols["id"]) if end_id is None else int(np.searchsorted(cols["id"], end_id, "left"))
+        return {k: v[lo:hi] for k, v in cols.items()}
+
+    def range(self, product_code, start=None, end=None):
+        """
+        return rows with start <= exec_date < end as a dict of arrays
+
+        start and end are datetimes, ISO 8601 strings (UTC) or milliseconds since the epoch.
+        """
+        cols = self.columns(product_code)
+        dates = cols["exec_date"]
+        lo = 0 if start is None else int(np.searchsorted(dates, _epoch_ms(start), "left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, _epoch_ms(end), "left"))
+        return {k: v[lo:hi] for k, v in cols.items()}
+
+
+def _epoch_ms(date):
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    if hasattr(date, "tzinfo") and date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(np.datetime64(date, "ms").astype("<i8"))
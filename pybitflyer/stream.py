@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+import codecs
+import json
+from .store import SIDES
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+
+# yielded by the parsers when they need the next chunk
+_MORE = object()
+
+
+class _Reader(object):
+    """
+    Incremental JSON reader over byte chunks fed to it
+
+    Only the text not yet consumed is kept, and every value is decoded once
+    it is complete, so memory stays at about one chunk plus one value. The
+    parsers below yield _MORE when they need the next chunk, so the same
+    parsing serves blocking (iter_rows) and asyncio (aiter_rows) sources.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def feed(self, chunk):
+        """
+        append the next chunk, or None at the end
+        """
+        text = self._decoder.decode(chunk or b"", final=chunk is None)
+        self.eof = chunk is None
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+
+    def peek(self):
+        """
+        return the next non-whitespace character, "" at the end, or None if
+        the next chunk is needed
+        """
+        buf, pos = self.buf, self.pos
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        self.pos = pos
+        if pos < len(buf):
+            return buf[pos]
+        return "" if self.eof else None
+
+    def value(self):
+        """
+        return the next value, or _MORE if it is not complete yet
+        """
+        if self.peek() is None:
+            return _MORE
+        try:
+            value, end = self._json.raw_decode(self.buf, self.pos)
+        except ValueError:
+            if self.eof:
+                raise
+            return _MORE
+        # a number cut by the end of a chunk ("12" of "12.5") parses too;
+        # a complete value is followed by a delimiter
+        if not self.eof and (end == len(self.buf) or self.buf[end] not in _DELIMITERS):
+            return _MORE
+        self.pos = end
+        return value
+
+
+def _peek(reader):
+    char = reader.peek()
+    while char is None:
+        yield _MORE
+        char = reader.peek()
+    return char
+
+
+def _value(reader):
+    value = reader.value()
+    while value is _MORE:
+        yield _MORE
+        value = reader.value()
+    return value
+
+
+def _expect(reader, char):
+    if (yield from _peek(reader)) != char:
+        raise ValueError("Expecting {!r} at {!r}".format(char, reader.buf[reader.pos:reader.pos + 20]))
+    reader.pos += 1
+
+
+def _items(reader, key=None):
+    # the values of an array, or (key, value) pairs if key is given
+    yield from _expect(reader, "[")
+    if (yield from _peek(reader)) == "]":
+        reader.pos += 1
+        return
+    while True:
+        # the generators are only entered when a chunk ends
+        value = reader.value()
+        if value is _MORE:
+            value = yield from _value(reader)
+        yield value if key is None else (key, value)
+        char = reader.peek()
+        if char is None:
+            char = yield from _peek(reader)
+        reader.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError("Expecting ',' or ']' in array")
+
+
+def _board(reader):
+    yield from _expect(reader, "{")
+    if (yield from _peek(reader)) == "}":
+        return
+    while True:
+        key = yield from _value(reader)
+        yield from _expect(reader, ":")
+        if (yield from _peek(reader)) == "[":
+            yield from _items(reader, key)
+        else:
+            value = yield from _value(reader)
+            yield key, value
+        char = yield from _peek(reader)
+        reader.pos += 1
+        if char == "}":
+            return
+        if char != ",":
+            raise ValueError("Expecting ',' or '}' in object")
+
+
+def _parse(parser, chunks):
+    reader = _Reader()
+    chunks = iter(chunks)
+    for item in parser(reader):
+        if item is _MORE:
+            reader.feed(next(chunks, None))
+        else:
+            yield item
+
+
+async def _aparse(parser, chunks):
+    reader = _Reader()
+    chunks = chunks.__aiter__()
+    for item in parser(reader):
+        if item is _MORE:
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+            reader.feed(chunk)
+        else:
+            yield item
+
+
+def iter_rows(chunks):
+    """
+    yield the elements of a JSON array (e.g. executions) as they arrive
+
+    `chunks` is an iterable of bytes, such as response.raw.stream(decode_content=True).
+    """
+    return _parse(_items, chunks)
+
+
+def iter_board(chunks):
+    """
+    yield ("mid_price", price), ("bids", level) and ("asks", level) of a board as they arrive
+    """
+    return _parse(_board, chunks)
+
+
+def aiter_rows(chunks):
+    """
+    iter_rows over an async iterable of bytes, such as response.content.iter_chunked(n) of aiohttp
+    """
+    return _aparse(_items, chunks)
+
+
+def aiter_board(chunks):
+    """
+    iter_board over an async iterable of bytes
+    """
+    return _aparse(_board, chunks)
+
+
+def fill_executions(rows, columns, start=0):
+    """
+    write execution rows into preallocated NumPy arrays and return the number written
+
+    `columns` is a dict with any of the arrays "id", "price", "size", "side"
+    (1 BUY, -1 SELL, 0 Itayose) and "exec_date" (milliseconds since the
+    epoch), as in store.COLUMNS. Rows are written from index `start` until
+    the rows or the arrays run out.
+    """
+    if np is None:
+        raise ImportError("fill_executions requires numpy: pip install numpy")
+    ids = columns.get("id")
+    prices = columns.get("price")
+    sizes = columns.get("size")
+    sides = columns.get("side")
+    dates = columns.get("exec_date")
+    capacity = min(len(c) for c in columns.values())
+    i = start
+    for row in rows:
+        if i >= capacity:
+            break
+        if ids is not None:
+            ids[i] = row["id"]
+        if prices is not None:
+            prices[i] = row["price"]
+        if sizes is not None:
+            sizes[i] = row["size"]
+        if sides is not None:
+            sides[i] = SIDES.get(row["side"], 0)
+        if dates is not None:
+            dates[i] = np.datetime64(row["exec_date"].rstrip("Z"), "ms").astype("<i8")
+        i += 1
+    return i - start
+
+
+def fill_board(items, bids, asks):
+    """
+    write a board into preallocated (n, 2) arrays of price and size
+
+    Returns (mid_price, number of bids, number of asks). Levels beyond the
+    length of an array are skipped.
+    """
+    counts = {"bids": 0, "asks": 0}
+    arrays = {"bids": bids, "asks": asks}
+    mid_price = None
+    for key, value in items:
+        if key == "mid_price":
+            mid_price = value
+            continue
+        array = arrays.get(key)
+        n = counts.get(key)
+        if array is None or n >= len(array):
+            continue
+        array[n, 0] = value["price"]
+        array[n, 1] = value["size"]
+        counts[key] = n + 1
+    return mid_price, counts["bids"], counts["asks"]
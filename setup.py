@@ -11,6 +11,12 @@ setup(
     author_email="yanagi.ayase@gmail.com",
     url="https://github.com/yagays/pybitflyer",
     install_requires=['requests'],
+    extras_require={
+        'async': ['aiohttp'],
+        'numpy': ['numpy'],
+        'realtime': ['websockets'],
+        'fast': ['orjson'],
+    },
     keywords=["bitcoin", "bitflyer", "wrapper", "REST API"],
     classifiers=[
         "Programming Language :: Python",
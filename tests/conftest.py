@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from mockserver import MockServer  # noqa: E402
+import pybitflyer  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def server():
+    with MockServer(board_depth=50) as server:
+        yield server
+
+
+@pytest.fixture
+def api(server):
+    api = pybitflyer.API(api_key="key", api_secret="secret")
+    api.api_url = server.url
+    return api
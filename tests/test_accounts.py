@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from pybitflyer import AccountPool, RateLimiter
+from pybitflyer.exception import APIException
+
+ORDER = dict(product_code="BTC_JPY", child_order_type="LIMIT", side="BUY", price=9000000, size=0.01)
+
+
+def pool(server, secret="secret"):
+    accounts = AccountPool({
+        "main": [("key1", "secret"), ("key2", "secret")],
+        "sub": ("key3", secret),
+    }, rate_limiter=RateLimiter(private=(10, 60), ip=(100, 60)))
+    for account in accounts:
+        for api in account.apis:
+            api.api_url = server.url
+    return accounts
+
+
+@pytest.fixture
+def accounts(server):
+    return pool(server)
+
+
+def private(accounts):
+    return dict((name, [b["private"] for b in budgets]) for name, budgets in accounts.remaining().items())
+
+
+def test_reads_go_to_the_key_with_most_budget(accounts):
+    main = accounts["main"]
+    for _ in range(3):
+        main.getbalance()
+    assert private(accounts)["main"] == [8, 9]
+    # orders always use the first key
+    main.sendchildorder(**ORDER)
+    main.sendchildorder(**ORDER)
+    assert private(accounts)["main"] == [6, 9]
+    assert main.apis[0].rate_limiter.remaining()["order"] == 298
+    assert main.getbalance() and private(accounts)["main"] == [6, 8]
+
+
+def test_keys_share_the_ip_budget(accounts):
+    accounts["main"].getbalance()
+    accounts["sub"].getbalance()
+    accounts["sub"].ticker(product_code="BTC_JPY")
+    budgets = accounts.remaining()
+    assert all(b["ip"] == 97 for keys in budgets.values() for b in keys)
+    assert private(accounts) == {"main": [9, 10], "sub": [9]}
+
+
+def test_aggregated_views(server, accounts):
+    collateral = accounts.total_collateral()
+    assert collateral["collateral"] == 200000
+    assert collateral["keep_rate"] == pytest.approx((200000 - 20) / 10000)
+    assert accounts.total_balance()["JPY"] == {"amount": 3.0, "available": 2.0}
+    assert accounts.total_position("FX_BTC_JPY", accounts=["sub"]) == server.position
+    assert accounts.total_balance(accounts=["sub"])["BTC"]["amount"] == 1.5
+
+
+def test_gather_returns_errors_per_account(server):
+    accounts = pool(server, secret="wrong")
+    results = accounts.gather("getbalance")
+    assert isinstance(results["sub"], APIException) and results["sub"].status_code == 401
+    assert results["main"][0]["currency_code"] == "JPY"
+    with pytest.raises(APIException):
+        accounts.total_balance()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+import mockserver
+
+import pybitflyer
+from pybitflyer import RetryPolicy
+from pybitflyer.exception import APIException, DeadlineExceeded
+
+pytest.importorskip("aiohttp")
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+def aio(server, **kwargs):
+    api = pybitflyer.AsyncAPI(api_key="key", api_secret="secret", **kwargs)
+    api.api_url = server.url
+    return api
+
+
+def test_query_is_sent_as_signed(server):
+    async def main():
+        async with aio(server) as api:
+            # reserved characters stay percent-encoded, as in the signed path
+            return await api.getchildorders(product_code="BTC_JPY", count=2, note="a:b/c")
+
+    assert len(run(main())) == 2
+
+
+class Recorder(object):
+    def __init__(self):
+        self.timings = []
+
+    def record(self, endpoint, method, status, timings, retries=0):
+        self.timings.append(timings)
+
+    def record_error(self, endpoint, method, error):
+        pass
+
+
+def test_metrics_phases_match_api(server, api):
+    api.metrics = Recorder()
+    api.board(product_code="BTC_JPY")
+
+    async def main():
+        async with aio(server, metrics=Recorder()) as api:
+            await api.board(product_code="BTC_JPY")
+            return api.metrics.timings[0]
+
+    timings = run(main())
+    assert set(timings) == set(api.metrics.timings[0])
+    assert abs(timings["wait"] + timings["transfer"] + timings["decode"] - timings["total"]) < 1e-6
+
+
+def test_streams(server):
+    async def main():
+        async with aio(server) as api:
+            rows = [row async for row in api.executions_stream(product_code="BTC_JPY", count=200)]
+            assert rows == await api.executions(product_code="BTC_JPY", count=200)
+            levels = [item async for item in api.board_stream(product_code="BTC_JPY")]
+            board = await api.board(product_code="BTC_JPY")
+            assert levels[0] == ("mid_price", board["mid_price"])
+            assert len(levels) == 1 + len(board["bids"]) + len(board["asks"])
+
+    run(main())
+
+
+def test_stream_holds_the_lock(server):
+    async def main():
+        async with aio(server, lock=asyncio.Lock()) as api:
+            rows = api.executions_stream(product_code="BTC_JPY", count=100)
+            await rows.__anext__()
+            assert api.lock.locked()
+            await rows.aclose()
+            assert not api.lock.locked()
+            return await api.executions(product_code="BTC_JPY", count=5)
+
+    assert len(run(main())) == 5
+
+
+def test_stream_is_retried_before_rows_arrive(server, monkeypatch):
+    monkeypatch.setattr(mockserver.random, "choice", lambda statuses: 503)
+    server.error_rate = 1
+
+    async def main():
+        async with aio(server, retry=RetryPolicy(total=2, base=0.001, cap=0.001)) as api:
+            with pytest.raises(APIException) as e:
+                async for _ in api.board_stream(product_code="BTC_JPY"):
+                    pass
+            return e.value.status_code
+
+    try:
+        before = server.requests
+        assert run(main()) == 503
+        assert server.requests - before == 3
+    finally:
+        server.error_rate = 0
+
+
+ORDER = dict(product_code="BTC_JPY", child_order_type="LIMIT", side="BUY", price=9000000, size=0.01)
+
+
+def test_public_private_and_typed_requests(server):
+    async def main():
+        async with aio(server) as api:
+            board, ticker, balance = await asyncio.gather(
+                api.board(product_code="BTC_JPY"), api.ticker(product_code="BTC_JPY"), api.getbalance())
+            order = await api.sendchildorder(**ORDER)
+        async with aio(server, typed=True) as typed:
+            executions = await typed.executions(product_code="BTC_JPY", count=10)
+        return board, ticker, balance, order, executions
+
+    board, ticker, balance, order, executions = run(main())
+    assert len(board["bids"]) == 50 and ticker["product_code"] == "BTC_JPY"
+    assert balance[0]["currency_code"] == "JPY" and "child_order_acceptance_id" in order
+    assert isinstance(executions, pybitflyer.models.ExecutionList) and len(executions) == 10
+
+
+@pytest.mark.parametrize("status,page,sent", [(500, None, 3), (502, b"<html>502</html>", 3), (429, None, 3)])
+def test_reads_are_retried(server, monkeypatch, status, page, sent):
+    monkeypatch.setattr(mockserver.random, "choice", lambda statuses: status)
+    server.error_rate = 1
+    server.error_page = page
+
+    async def main():
+        async with aio(server, retry=RetryPolicy(total=2, base=0.001, cap=0.001)) as api:
+            with pytest.raises(APIException) as e:
+                await api.ticker(product_code="BTC_JPY")
+            return e.value.status_code
+
+    try:
+        before = server.requests
+        assert run(main()) == status
+        assert server.requests - before == sent
+    finally:
+        server.error_rate = 0
+        server.error_page = None
+
+
+@pytest.mark.parametrize("status,sent", [(500, 1), (429, 3)])
+def test_orders_are_retried_only_when_refused(server, monkeypatch, status, sent):
+    monkeypatch.setattr(mockserver.random, "choice", lambda statuses: status)
+    server.error_rate = 1
+
+    async def main():
+        async with aio(server, retry=RetryPolicy(total=2, base=0.001, cap=0.001)) as api:
+            with pytest.raises(APIException):
+                await api.sendchildorder(**ORDER)
+
+    try:
+        before = server.requests
+        run(main())
+        assert server.requests - before == sent
+    finally:
+        server.error_rate = 0
+
+
+def test_retries_recover(server):
+    server.error_rate = 0.5
+
+    async def main():
+        async with aio(server, retry=RetryPolicy(total=30, base=0.001, cap=0.001),
+                       metrics=pybitflyer.Metrics()) as api:
+            for _ in range(5):
+                await api.ticker(product_code="BTC_JPY")
+            return api.metrics.snapshot()["/v1/ticker"]
+
+    try:
+        before = server.requests
+        snapshot = run(main())
+        sent = server.requests - before
+    finally:
+        server.error_rate = 0
+    assert snapshot["requests"][200] == 5 and sum(snapshot["requests"].values()) == sent
+    assert snapshot["retries"] == sent - 5
+
+
+def test_batch_deadline(server):
+    async def main():
+        async with aio(server) as api:
+            await api.gethealth()  # opens the connection before the deadline starts
+            server.latency = 0.3
+            return await api.send_orders([ORDER, ORDER], deadline=0.1)
+
+    try:
+        results = run(main())
+    finally:
+        server.latency = 0
+    assert all(isinstance(r, DeadlineExceeded) and r.sent for r in results)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import pickle
+import threading
+import time
+
+import pytest
+
+import pybitflyer
+from pybitflyer.exception import APIException, AuthException, DeadlineExceeded
+from pybitflyer.models import ExecutionList, convert
+
+ORDER = dict(product_code="BTC_JPY", child_order_type="LIMIT", side="BUY", price=9000000, size=0.01)
+
+
+def test_public_and_private(api):
+    assert api.ticker(product_code="BTC_JPY")["product_code"] == "BTC_JPY"
+    assert len(api.executions(product_code="BTC_JPY", count=10)) == 10
+    assert api.getbalance()[0]["currency_code"] == "JPY"
+    with pytest.raises(AuthException):
+        pybitflyer.API().getbalance()
+
+
+def test_requests_are_verified_by_their_signature(server):
+    api = pybitflyer.API(api_key="key", api_secret="wrong")
+    api.api_url = server.url
+    with pytest.raises(APIException) as e:
+        api.getbalance()
+    assert e.value.status_code == 401
+    api = pybitflyer.API(api_key="key", api_secret="secret")
+    api.api_url = server.url
+    assert len(api.getchildorders(product_code="BTC_JPY", count=3)) == 3
+    assert "child_order_acceptance_id" in api.sendchildorder(**ORDER)
+
+
+def test_deadline_stops_unsent_orders(server, api):
+    api.rate_limiter = pybitflyer.RateLimiter(order=(1, 2))
+    before = server.requests
+    start = time.monotonic()
+    results = api.send_orders([ORDER, ORDER], deadline=0.5)
+    assert time.monotonic() - start < 1
+    assert "child_order_acceptance_id" in results[0]
+    assert isinstance(results[1], DeadlineExceeded) and not results[1].sent
+    time.sleep(0.6)
+    assert server.requests - before == 1
+
+
+def test_deadline_reports_orders_in_flight(server, api):
+    server.latency = 0.3
+    try:
+        results = api.send_orders([ORDER, ORDER], deadline=0.1)
+    finally:
+        server.latency = 0
+    assert all(isinstance(r, DeadlineExceeded) and r.sent for r in results)
+
+
+def test_stream_holds_slot_and_lock(api):
+    api.lock = threading.Lock()
+    api.concurrency = pybitflyer.ConcurrencyController(limits={"public": 1})
+    rows = api.executions_stream(product_code="BTC_JPY", count=100)
+    next(rows)
+    assert api.lock.locked()
+    rows.close()
+    assert not api.lock.locked()
+    assert len(api.executions(product_code="BTC_JPY", count=5)) == 5
+
+
+def test_typed_empty_responses():
+    assert isinstance(convert("/v1/executions", []), ExecutionList)
+    assert len(convert("/v1/board", {}).bid_prices) == 0
+    assert convert("/v1/me/getchildorders", []) == []
+    assert convert("/v1/executions", None) is None
+    # what API returns for an empty body
+    assert isinstance(convert("/v1/executions", ""), ExecutionList)
+    assert convert("/v1/ticker", "").product_code is None
+    assert len(convert("/v1/board", "").ask_prices) == 0
+    assert convert("/v1/me/getcollateral", "").collateral is None
+    assert convert("/v1/me/getpositions", "") == []
+    assert convert("/v1/me/cancelchildorder", "") == ""
+
+
+def test_pickled_api(api):
+    api.lock = threading.Lock()
+    copy = pickle.loads(pickle.dumps(api))
+    assert copy.lock is not api.lock and copy.signer.sign("1", "GET", "/") == api.signer.sign("1", "GET", "/")
+    assert copy.ticker(product_code="BTC_JPY")["product_code"] == "BTC_JPY"
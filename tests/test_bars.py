@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from pybitflyer import aggregate, BarAggregator, paginate
+from pybitflyer.models import ExecutionList
+
+np = pytest.importorskip("numpy")
+
+
+def assert_bars_equal(actual, expected):
+    assert set(actual) == set(expected)
+    for name in expected:
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-12, err_msg=name)
+
+
+def test_incremental_updates_match_aggregate(api):
+    executions = api.executions(product_code="BTC_JPY", count=500)
+    expected = aggregate(executions, 1)
+    bars = BarAggregator(1)
+    # oldest first, in overlapping pages of uneven size
+    ascending = executions[::-1]
+    for start in range(0, len(ascending), 37):
+        bars.update(ascending[max(start - 5, 0):start + 37])
+        bars.bars()
+    assert_bars_equal(bars.bars(), expected)
+    assert bars.last()["time"] == expected["time"][-1]
+
+
+def test_update_forms(api):
+    expected = aggregate(api.executions(product_code="BTC_JPY", count=300), 0.5)
+    api.typed = True
+    typed = api.executions(product_code="BTC_JPY", count=300)
+    assert isinstance(typed, ExecutionList)
+    bars = BarAggregator(0.5)
+    assert bars.update(typed) == 300
+    assert bars.update(typed) == 0
+    assert_bars_equal(bars.bars(), expected)
+
+
+def test_paginated_updates(api):
+    rows = list(paginate(api.executions, count=100, after=2500000000 - 450))
+    expected = aggregate(rows, 2)
+    bars = BarAggregator(2)
+    bars.update(paginate(api.executions, count=100, after=2500000000 - 450))
+    assert_bars_equal(bars.bars(), expected)
+    assert bars.bars()["count"].sum() == 450
+
+
+def test_ohlcv():
+    executions = [
+        {"id": 1, "exec_date": "2024-01-01T00:00:00.000", "price": 10.0, "size": 1.0, "side": "BUY"},
+        {"id": 2, "exec_date": "2024-01-01T00:00:30.000", "price": 12.0, "size": 1.0, "side": "SELL"},
+        {"id": 3, "exec_date": "2024-01-01T00:00:59.999", "price": 9.0, "size": 2.0, "side": "BUY"},
+        {"id": 4, "exec_date": "2024-01-01T00:02:00.000", "price": 11.0, "size": 1.0, "side": ""},
+    ]
+    bars = aggregate(executions, 60)
+    assert bars["open"].tolist() == [10.0, 11.0]
+    assert bars["high"].tolist() == [12.0, 11.0]
+    assert bars["low"].tolist() == [9.0, 11.0]
+    assert bars["close"].tolist() == [9.0, 11.0]
+    assert bars["volume"].tolist() == [4.0, 1.0]
+    assert bars["vwap"][0] == pytest.approx(40.0 / 4)
+    assert bars["count"].tolist() == [3, 1]
+    assert bars["buy_volume"].tolist() == [3.0, 0.0]
+    assert bars["sell_volume"].tolist() == [1.0, 0.0]
+    assert len(aggregate([], 60)["time"]) == 0
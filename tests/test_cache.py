@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pybitflyer
+from pybitflyer import ResponseCache
+
+
+def test_responses_are_cached_for_their_ttl(server, api):
+    api.cache = ResponseCache(ttls={"/v1/markets": 0.2})
+    before = server.requests
+    markets = api.markets()
+    markets.append("modified")
+    assert api.markets() == markets[:-1]  # a copy of the cached response
+    assert server.requests - before == 1
+    time.sleep(0.25)
+    api.markets()
+    assert server.requests - before == 2
+    api.ticker(product_code="BTC_JPY")
+    api.ticker(product_code="BTC_JPY")
+    assert server.requests - before == 4  # not a cached endpoint
+
+
+def test_concurrent_requests_share_one_flight(server, api):
+    api.cache = ResponseCache()
+    server.latency = 0.2
+    try:
+        before = server.requests
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda _: api.markets(), range(8)))
+    finally:
+        server.latency = 0
+    assert server.requests - before == 1
+    assert all(r == results[0] for r in results) and len({id(r) for r in results}) == 8
+
+
+def test_failed_flight_is_not_cached(server, api):
+    api.cache = ResponseCache()
+    server.error_rate = 1
+    try:
+        before = server.requests
+        for _ in range(2):
+            try:
+                api.markets()
+            except Exception:
+                pass
+        assert server.requests - before == 2
+    finally:
+        server.error_rate = 0
+
+
+def test_invalidation_during_a_fetch(server, api):
+    api.cache = ResponseCache()
+    server.delays = [0.3]
+    flight = threading.Thread(target=api.markets)
+    flight.start()
+    time.sleep(0.1)
+    api.cache.invalidate("/v1/markets")  # e.g. after a change the fetch may predate
+    flight.join()
+    before = server.requests
+    api.markets()
+    assert server.requests - before == 1  # the response of the old flight was not kept
+    api.markets()
+    assert server.requests - before == 1
+
+
+def test_keys_do_not_share_responses(server, api):
+    api.cache = ResponseCache()
+    before = server.requests
+    api.gettradingcommission(product_code="BTC_JPY")
+    api.gettradingcommission(product_code="ETH_JPY")
+    other = pybitflyer.API(api_key="other", api_secret="secret", cache=api.cache)
+    other.api_url = server.url
+    other.gettradingcommission(product_code="BTC_JPY")
+    assert server.requests - before == 3
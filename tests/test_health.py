@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import pickle
+import threading
+import time
+
+import pytest
+
+import pybitflyer
+from pybitflyer import HealthMonitor, ConcurrencyController
+from pybitflyer.exception import ExchangeUnavailableException
+
+ORDER = dict(product_code="BTC_JPY", child_order_type="LIMIT", side="BUY", price=9000000, size=0.01)
+
+
+@pytest.fixture
+def monitor(api):
+    monitor = HealthMonitor()
+    api.health = monitor
+    monitor.attach(api)
+    return monitor
+
+
+def test_orders_are_held_while_the_exchange_is_closed(server, api, monitor):
+    monitor.update("STOP")
+    results = []
+    before = server.requests
+    sender = threading.Thread(target=lambda: results.append(api.sendchildorder(**ORDER)))
+    sender.start()
+    time.sleep(0.2)
+    assert results == [] and server.requests == before
+    api.cancelchildorder(product_code="BTC_JPY", child_order_acceptance_id="JRF1")  # not held
+    api.ticker(product_code="BTC_JPY")
+    assert server.requests - before == 2
+    monitor.update("NORMAL")
+    sender.join(1)
+    assert "child_order_acceptance_id" in results[0]
+
+
+def test_orders_are_rejected_without_blocking(server, api, monitor):
+    monitor.block = False
+    monitor.update("NO ORDER")
+    with pytest.raises(ExchangeUnavailableException):
+        api.sendchildorder(**ORDER)
+    monitor.block = True
+    monitor.order_timeout = 0.1
+    start = time.monotonic()
+    with pytest.raises(ExchangeUnavailableException):
+        api.sendchildorder(**ORDER)
+    assert 0.1 <= time.monotonic() - start < 0.5
+
+
+def test_concurrency_and_timeouts_scale_with_health(api, monitor):
+    api.concurrency = ConcurrencyController(limits={"public": 8, "private": 4})
+    api.timeout = 2
+    monitor.update("VERY BUSY")
+    assert api.concurrency._categories["public"].limit == 4
+    assert api.concurrency._categories["private"].limit == 2
+    assert api._timeout("/v1/ticker", None) == 4
+    assert monitor.scale_interval(5) == 10
+    monitor.update("NORMAL")
+    assert api.concurrency._categories["public"].limit == 8
+    assert api._timeout("/v1/ticker", None) == 2
+
+
+def test_poll_reads_the_board_state(api, monitor):
+    monitor.update("BUSY")
+    monitor.poll()
+    assert monitor.health == "NORMAL" and monitor.state == "RUNNING"
+
+
+def test_monitor_of_a_pickled_api(api, monitor):
+    copy = pickle.loads(pickle.dumps(api))
+    assert copy.health is not monitor and copy.health.api is copy
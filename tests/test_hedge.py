@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pybitflyer import HedgePolicy
+
+
+def test_fast_requests_are_not_hedged(server, api):
+    api.hedge = HedgePolicy(initial_delay=0.5)
+    before = server.requests
+    for _ in range(5):
+        api.ticker(product_code="BTC_JPY")
+    assert server.requests - before == 5
+    assert api.hedge.stats()["hedges"] == 0
+
+
+def test_first_response_wins(server, api):
+    api.hedge = HedgePolicy(initial_delay=0.05)
+    server.delays = [0.5]  # the first request is slow, the hedge is not
+    start = time.monotonic()
+    assert api.ticker(product_code="BTC_JPY")["product_code"] == "BTC_JPY"
+    assert time.monotonic() - start < 0.3
+    stats = api.hedge.stats()
+    assert stats["hedges"] == 1 and stats["wins"] == 1
+
+
+def test_slow_hedge_loses(server, api):
+    api.hedge = HedgePolicy(initial_delay=0.05)
+    server.delays = [0.15, 0.5]
+    start = time.monotonic()
+    api.ticker(product_code="BTC_JPY")
+    assert time.monotonic() - start < 0.3
+    stats = api.hedge.stats()
+    assert stats["hedges"] == 1 and stats["wins"] == 0
+
+
+def test_hedges_stay_within_budget(server, api):
+    api.hedge = HedgePolicy(initial_delay=0.01, budget=0, burst=2)
+    server.latency = 0.05
+    try:
+        before = server.requests
+        for _ in range(5):
+            api.ticker(product_code="BTC_JPY")
+        time.sleep(0.1)
+    finally:
+        server.latency = 0
+    assert api.hedge.stats()["hedges"] == 2
+    assert server.requests - before == 7
+
+
+def test_delay_follows_recent_latency(server, api):
+    api.hedge = HedgePolicy(initial_delay=1, percentile=50, min_delay=0.001)
+    for _ in range(HedgePolicy.min_samples):
+        api.ticker(product_code="BTC_JPY")
+    assert api.hedge.delay("/v1/ticker") < 0.1
+    assert api.hedge.delay("/v1/board") == 1
+
+
+def test_concurrent_calls_do_not_queue(server, api):
+    api.hedge = HedgePolicy(initial_delay=1)
+    server.latency = 0.1
+    try:
+        start = time.monotonic()
+        with ThreadPoolExecutor(30) as executor:
+            list(executor.map(lambda _: api.ticker(product_code="BTC_JPY"), range(30)))
+        assert time.monotonic() - start < 0.5
+    finally:
+        server.latency = 0
+    assert api.hedge.stats()["hedges"] == 0
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from pybitflyer import OrderLane
+
+ORDER = dict(product_code="BTC_JPY", child_order_type="LIMIT", side="BUY", price=9000000, size=0.01)
+
+
+@pytest.fixture
+def lane(server, api):
+    lane = OrderLane(connections=2, ping_interval=0.2)
+    api.order_lane = lane
+    lane.start(server.url)
+    yield lane
+    lane.close()
+
+
+def test_start_opens_the_connections(server, lane):
+    stats = lane.stats()
+    assert stats["pings"]["count"] == 2 and stats["orders"]["count"] == 0
+
+
+def test_orders_and_cancels_use_the_lane(api, lane):
+    api.sendchildorder(**ORDER)
+    api.cancelchildorder(product_code="BTC_JPY", child_order_acceptance_id="JRF1")
+    api.ticker(product_code="BTC_JPY")
+    api.getbalance()
+    assert lane.stats()["orders"]["count"] == 2
+
+
+def test_idle_connections_are_pinged(server, api, lane):
+    before = server.requests
+    time.sleep(0.5)
+    assert server.requests - before >= 2
+    assert lane.stats()["pings"]["count"] >= 4
+
+
+def test_orders_postpone_pings(server, api, lane):
+    pings = lane.stats()["pings"]["count"]
+    for _ in range(6):
+        api.sendchildorder(**ORDER)
+        time.sleep(0.05)
+    assert lane.stats()["pings"]["count"] == pings
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import random
+
+from pybitflyer import OrderBook
+from pybitflyer.models import Board
+
+
+def levels(pairs):
+    return [{"price": p, "size": s} for p, s in pairs]
+
+
+def make_book():
+    return OrderBook({"mid_price": 100.0,
+                      "bids": levels([(99, 1.0), (98, 2.0), (97, 3.0)]),
+                      "asks": levels([(101, 0.5), (102, 1.5), (103, 2.5)])})
+
+
+def test_snapshot():
+    book = make_book()
+    assert book.best_bid() == (99, 1.0)
+    assert book.best_ask() == (101, 0.5)
+    assert book.spread() == 2
+    assert book.depth("bids") == [(99, 1.0), (98, 2.0), (97, 3.0)]
+    assert book.depth("asks", 2) == [(101, 0.5), (102, 1.5)]
+
+
+def test_diffs_change_add_and_remove_levels():
+    book = make_book()
+    book.update({"mid_price": 100.5, "bids": levels([(99, 0), (98, 4.0), (99.5, 0.1)]),
+                 "asks": levels([(101, 0), (100.5, 0.2), (104, 1.0)])})
+    assert book.mid_price == 100.5
+    assert book.depth("bids") == [(99.5, 0.1), (98, 4.0), (97, 3.0)]
+    assert book.depth("asks") == [(100.5, 0.2), (102, 1.5), (103, 2.5), (104, 1.0)]
+    assert book.size_at("bids", 99) == 0.0
+    # removing a level that does not exist is a no-op
+    book.update({"bids": levels([(50, 0)]), "asks": []})
+    assert len(book.depth("bids")) == 3
+
+
+def test_queries():
+    book = make_book()
+    assert book.cumulative_size("asks", 102) == 2.0
+    assert book.cumulative_size("bids", 98) == 3.0
+    assert book.vwap("BUY", 2.0) == (0.5 * 101 + 1.5 * 102) / 2.0
+    assert book.vwap("SELL", 100) is None
+
+
+def test_random_diffs_match_a_dict():
+    rng = random.Random(7)
+    book = OrderBook()
+    expected = {"bids": {}, "asks": {}}
+    for _ in range(2000):
+        side = rng.choice(["bids", "asks"])
+        price = rng.randrange(90, 110) if side == "bids" else rng.randrange(100, 120)
+        size = rng.choice([0, 0.1, 0.2, 1.0])
+        book.update({side: levels([(price, size)])})
+        if size:
+            expected[side][price] = size
+        else:
+            expected[side].pop(price, None)
+    assert book.depth("bids") == sorted(expected["bids"].items(), reverse=True)
+    assert book.depth("asks") == sorted(expected["asks"].items())
+
+
+def test_typed_board(api):
+    api.typed = True
+    board = api.board(product_code="BTC_JPY")
+    assert isinstance(board, Board)
+    book = OrderBook(board)
+    assert book.best_bid() == (board.bid_prices[0], board.bid_sizes[0])
+    assert book.best_ask() == (board.ask_prices[0], board.ask_sizes[0])
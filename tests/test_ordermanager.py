@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from mockserver import MockServer
+import pybitflyer
+from pybitflyer import OrderManager
+
+ORDER = dict(child_order_type="LIMIT", side="BUY", price=9000000, size=0.03)
+
+
+@pytest.fixture
+def server():
+    # the account of the mock must start empty for every test
+    with MockServer(board_depth=5) as server:
+        yield server
+
+
+@pytest.fixture
+def manager(api):
+    manager = OrderManager(api, "FX_BTC_JPY", grace=0)
+    manager.initialize()
+    return manager
+
+
+def test_fills_are_applied_once(server, manager):
+    order = manager.send(**ORDER)
+    aid = order["child_order_acceptance_id"]
+    assert manager.open_orders() == [order]
+    server.fill(aid, 0.01)
+    manager.reconcile()
+    manager.reconcile()
+    assert manager.order(aid)["executed_size"] == 0.01
+    assert manager.order(aid)["outstanding_size"] == 0.02
+    server.fill(aid)
+    manager.reconcile()
+    assert manager.order(aid)["child_order_state"] == "COMPLETED"
+    assert manager.open_orders() == []
+    assert manager.position == server.position == 0.03
+
+
+def test_fill_seen_before_send_returns(server, api):
+    manager = OrderManager(api, "FX_BTC_JPY")
+    manager.initialize()
+    send = api.sendchildorder
+
+    def sendchildorder(**params):
+        # the order executes and reconcile() runs before send() records it
+        response = send(**params)
+        server.fill(response["child_order_acceptance_id"])
+        manager.reconcile()
+        return response
+
+    api.sendchildorder = sendchildorder
+    order = manager.send(**ORDER)
+    assert order["child_order_state"] == "COMPLETED" and order["executed_size"] == 0.03
+    manager.reconcile()
+    assert manager.position == 0.03
+
+
+def test_cancel_is_confirmed(server, manager):
+    aid = manager.send(**ORDER)["child_order_acceptance_id"]
+    manager.cancel(aid)
+    assert manager.order(aid)["child_order_state"] == "CANCELING"
+    manager.reconcile()
+    assert manager.order(aid)["child_order_state"] == "CANCELED"
+    assert manager.open_orders() == []
+    before = server.requests
+    manager.reconcile()
+    assert server.requests - before == 1  # executions only; known states are not looked up
+
+
+def test_confirmed_orders_are_not_looked_up(server, manager):
+    manager.send(**ORDER)
+    manager.reconcile()
+    before = server.requests
+    manager.reconcile()
+    assert server.requests - before == 1
+
+
+def test_initialize_counts_fills_in_the_position_once(server, api):
+    aid = api.sendchildorder(product_code="FX_BTC_JPY", **ORDER)["child_order_acceptance_id"]
+    getpositions = api.getpositions
+    fills = [0.01]
+
+    def racing_getpositions(**params):
+        # an execution lands after the latest execution id was read
+        if fills:
+            server.fill(aid, fills.pop())
+        return getpositions(**params)
+
+    api.getpositions = racing_getpositions
+    manager = OrderManager(api, "FX_BTC_JPY")
+    manager.initialize()
+    assert manager.position == 0.01
+    assert manager.order(aid)["outstanding_size"] == 0.02
+    manager.reconcile()
+    assert manager.position == server.position == 0.01
+
+
+def test_initialize_loads_active_orders_and_position(server, api):
+    aid = api.sendchildorder(product_code="FX_BTC_JPY", **dict(ORDER, side="SELL"))["child_order_acceptance_id"]
+    server.fill(aid, 0.01)
+    manager = OrderManager(api, "FX_BTC_JPY")
+    manager.initialize()
+    assert [o["child_order_acceptance_id"] for o in manager.open_orders()] == [aid]
+    assert manager.position == -0.01
+
+
+def test_typed_api(server):
+    api = pybitflyer.API(api_key="key", api_secret="secret", typed=True)
+    api.api_url = server.url
+    manager = OrderManager(api, "FX_BTC_JPY", grace=0)
+    aid = manager.send(**ORDER)["child_order_acceptance_id"]
+    manager.reconcile()
+    server.fill(aid)
+    manager.reconcile()
+    assert manager.position == 0.03 and manager.open_orders() == []
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import pytest
+
+from pybitflyer import paginate
+
+NEWEST = 2500000000
+
+
+def ids(rows):
+    return [row["id"] for row in rows]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_after_stops_exclusively(api, prefetch):
+    rows = list(paginate(api.executions, count=100, after=NEWEST - 250, prefetch=prefetch))
+    assert ids(rows) == list(range(NEWEST, NEWEST - 250, -1))
+
+
+def test_before_starts_below(api):
+    rows = list(paginate(api.executions, count=100, before=NEWEST - 10, after=NEWEST - 20))
+    assert ids(rows) == list(range(NEWEST - 11, NEWEST - 20, -1))
+
+
+def test_since_stops_at_older_rows(api):
+    # exec_date of id n is 2024-01-01 + 7n milliseconds in the mock
+    since = datetime(2024, 1, 1) + timedelta(milliseconds=(NEWEST - 120) * 7)
+    rows = list(paginate(api.executions, count=50, since=since))
+    assert ids(rows) == list(range(NEWEST, NEWEST - 121, -1))
+
+
+def test_overlapping_pages_are_deduplicated():
+    # every page repeats the oldest row of the previous one
+    def method(count, before=None, after=None):
+        rows = [i for i in range(10, 4, -1)
+                if (before is None or i <= before) and (after is None or i > after)]
+        return [{"id": i} for i in rows[:count]]
+
+    assert ids(paginate(method, count=3)) == [10, 9, 8, 7, 6, 5]
+    assert ids(paginate(method, count=3, after=6)) == [10, 9, 8, 7]
+
+
+def test_empty_page_ends(api):
+    assert list(paginate(api.executions, count=100, after=NEWEST)) == []
+
+
+def test_private_endpoints(api):
+    rows = list(paginate(api.getchildorders, count=100, product_code="BTC_JPY", after=1000000 - 230))
+    assert len(rows) == len(set(ids(rows))) == 230
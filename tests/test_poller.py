@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pybitflyer
+from pybitflyer import MarketDataPoller, HedgePolicy, ResponseCache
+from pybitflyer.poller import Subscription, Update
+
+
+def poll(poller, seconds):
+    poller.start()
+    time.sleep(seconds)
+    poller.stop()
+
+
+def test_unchanged_responses_are_not_delivered(api):
+    poller = MarketDataPoller(api)
+    board = poller.add("board", 0.02, product_code="BTC_JPY")
+    ticker = poller.add("ticker", 0.02, product_code="BTC_JPY")
+    boards = poller.subscribe(methods=["board"])
+    tickers = poller.subscribe(product_codes=["BTC_JPY"], methods=["ticker"])
+    poll(poller, 0.3)
+    assert board.polls > 3 and board.changes == 1
+    assert ticker.polls > 3 and ticker.changes == ticker.polls  # tick_id changes every time
+    assert [u.method for u in boards] == ["board"]
+    assert len(list(tickers)) == ticker.changes
+    assert poller.errors == 0
+
+
+def test_digest_of_typed_hedged_and_cached_values(server):
+    api = pybitflyer.API(typed=True, hedge=HedgePolicy(), cache=ResponseCache(ttls={"/v1/markets": 60}))
+    api.api_url = server.url
+    poller = MarketDataPoller(api)
+    board = poller.add("board", 0.02, product_code="BTC_JPY")
+    markets = poller.add("markets", 0.02)
+    poll(poller, 0.2)
+    assert board.changes == 1 and markets.changes == 1
+    assert board.polls > 3 and markets.polls > 3
+
+
+def test_slow_consumers_lose_the_oldest_updates():
+    subscription = Subscription(None, maxsize=2)
+    for i in range(5):
+        subscription.put(Update("ticker", {}, i, i))
+    assert subscription.dropped == 3
+    assert [subscription.get(0).value for _ in range(2)] == [3, 4]
+    assert subscription.get(0.01) is None
+
+
+def test_intervals_stretch_to_the_rate_budget(api):
+    api.rate_limiter = pybitflyer.RateLimiter(ip=(10, 1))
+    poller = MarketDataPoller(api)
+    assert poller.max_rate == 10
+    for product_code in ("BTC_JPY", "ETH_JPY", "FX_BTC_JPY", "XRP_JPY"):
+        poller.add("ticker", 0.2, product_code=product_code)
+    assert poller.stretch() == 2
+    jobs = list(poller.jobs.values())
+    poll(poller, 0.5)
+    assert sum(job.polls for job in jobs) <= 8
+
+
+def test_stop_wakes_consumers(api):
+    poller = MarketDataPoller(api)
+    subscription = poller.subscribe()
+    poller.start()
+    poller.stop()
+    assert list(subscription) == [] and subscription.closed
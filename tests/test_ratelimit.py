@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+
+import pytest
+
+import pybitflyer
+from pybitflyer import RateLimiter
+from pybitflyer.exception import RateLimitException
+
+_api = None
+
+
+def _init(api):
+    global _api
+    _api = api
+
+
+def _ticker(product_code):
+    return _api.ticker(product_code=product_code)["product_code"]
+
+
+def _ticker_of(api):
+    return api.ticker(product_code="BTC_JPY")["product_code"]
+
+
+def test_budgets_are_counted_per_category():
+    limiter = RateLimiter(private=(2, 60), order=(1, 60), ip=(3, 60), block=False)
+    limiter.acquire("/v1/ticker")
+    limiter.acquire("/v1/me/sendchildorder")
+    assert limiter.remaining() == {"private": 1, "order": 0, "ip": 1}
+    with pytest.raises(RateLimitException) as e:
+        limiter.acquire("/v1/me/sendchildorder")
+    assert e.value.budget == "order"
+    limiter.acquire("/v1/me/getbalance")
+    with pytest.raises(RateLimitException):
+        limiter.acquire("/v1/ticker")
+
+
+def test_derived_limiters_share_the_ip_budget():
+    limiter = RateLimiter(ip=(2, 60), block=False)
+    other = limiter.derive()
+    other.acquire("/v1/me/getbalance")
+    assert limiter.remaining()["ip"] == 1 and limiter.remaining()["private"] == 500
+    assert other.remaining()["private"] == 499
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_shared_budget_of_workers(server, method):
+    # a shared limiter, and an API holding one, are sent to workers when they start
+    context = multiprocessing.get_context(method)
+    limiter = RateLimiter(ip=(100, 300), shared=True, context=context)
+    api = pybitflyer.API(rate_limiter=limiter)
+    api.api_url = server.url
+    with context.Pool(2, initializer=_init, initargs=(api,)) as pool:
+        assert pool.map(_ticker, ["BTC_JPY"] * 6) == ["BTC_JPY"] * 6
+    assert limiter.remaining()["ip"] == 94
+
+
+def test_shared_limiter_is_not_sent_to_running_workers(server):
+    limiter = RateLimiter(shared=True)
+    api = pybitflyer.API(rate_limiter=limiter)
+    api.api_url = server.url
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        with pytest.raises(RuntimeError):
+            pool.map(_ticker_of, [api])
+        # an unshared limiter arrives with fresh budgets
+        api.rate_limiter = RateLimiter()
+        assert pool.map(_ticker_of, [api]) == ["BTC_JPY"]
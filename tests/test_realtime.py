@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+
+import pytest
+
+from mockserver import MockRealtimeServer
+from pybitflyer import RealtimeAPI
+from pybitflyer.realtime import ticker_channel, board_channel
+
+pytest.importorskip("websockets")
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+async def receive(rt, n):
+    messages = []
+    async for item in rt.messages():
+        messages.append(item)
+        if len(messages) == n:
+            break
+    return messages
+
+
+def test_messages_and_callbacks():
+    async def main():
+        server = MockRealtimeServer(interval=0.005)
+        ws = await server.serve()
+        rt = RealtimeAPI(url=server.url)
+        tickers = []
+        rt.subscribe(ticker_channel("BTC_JPY"), tickers.append)
+        rt.subscribe(board_channel("BTC_JPY"))
+        task = asyncio.ensure_future(rt.run())
+        try:
+            messages = await receive(rt, 10)
+        finally:
+            await rt.close()
+            await task
+            ws.close()
+        return tickers, messages
+
+    tickers, messages = run(main())
+    assert tickers and all(t["product_code"] == "BTC_JPY" for t in tickers)
+    assert set(channel for channel, _ in messages) == {ticker_channel("BTC_JPY"), board_channel("BTC_JPY")}
+
+
+def test_failing_callbacks_do_not_stop_the_reader(caplog):
+    async def main():
+        server = MockRealtimeServer(interval=0.005)
+        ws = await server.serve()
+        rt = RealtimeAPI(url=server.url, logger=logging.getLogger("realtime-test"))
+        received = []
+
+        def broken(message):
+            raise ValueError("broken callback")
+
+        async def slow(message):
+            await asyncio.sleep(10)
+
+        async def failing(message):
+            raise KeyError("failing coroutine")
+
+        for callback in (broken, slow, failing, received.append):
+            rt.subscribe(ticker_channel("BTC_JPY"), callback)
+        task = asyncio.ensure_future(rt.run())
+        try:
+            while len(received) < 20:
+                await asyncio.sleep(0.01)
+        finally:
+            await rt.close()
+            await task
+            ws.close()
+            for pending in list(rt._tasks):
+                pending.cancel()
+        return received
+
+    with caplog.at_level(logging.ERROR, logger="realtime-test"):
+        assert len(run(main())) >= 20
+    assert "broken callback" in caplog.text
+    assert "failing coroutine" in caplog.text
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+import requests
+
+import mockserver
+
+import pybitflyer
+from pybitflyer import RetryPolicy
+from pybitflyer.exception import APIException, DeadlineExceeded
+
+SEND = "/v1/me/sendchildorder"
+CANCEL = "/v1/me/cancelchildorder"
+
+
+class ConnectTimeout(Exception):
+    pass
+
+
+@pytest.mark.parametrize("status", [500, 502, 503, 504])
+def test_orders_are_not_retried_on_server_errors(status):
+    policy = RetryPolicy(total=5)
+    assert not policy.should_retry(SEND, "POST", 0, status)
+    assert not policy.should_retry("/v1/me/sendparentorder", "POST", 0, status)
+    assert policy.should_retry(CANCEL, "POST", 0, status)
+    assert policy.should_retry("/v1/ticker", "GET", 0, status)
+
+
+@pytest.mark.parametrize("error", [requests.ReadTimeout(), requests.ConnectionError(), OSError()])
+def test_orders_are_not_retried_on_read_errors(error):
+    policy = RetryPolicy(total=5)
+    assert not policy.should_retry(SEND, "POST", 0, error=error)
+    assert policy.should_retry("/v1/ticker", "GET", 0, error=error)
+
+
+def test_orders_are_retried_when_they_were_not_sent():
+    policy = RetryPolicy(total=5)
+    assert policy.should_retry(SEND, "POST", 0, 429)
+    assert policy.should_retry(SEND, "POST", 0, error=requests.ConnectTimeout())
+    assert policy.should_retry(SEND, "POST", 0, error=ConnectTimeout())
+    assert not policy.should_retry(SEND, "POST", 5, 429)
+
+
+def test_backoff_is_capped():
+    policy = RetryPolicy(base=0.1, cap=2)
+    assert policy.backoff(None, {"Retry-After": "30"}) == 2
+    assert policy.backoff(None, {"Retry-After": "0.5"}) == 0.5
+    delay = None
+    for _ in range(20):
+        delay = policy.backoff(delay)
+        assert 0.1 <= delay <= 2
+
+
+@pytest.mark.parametrize("status,sent", [(500, 1), (429, 4)])
+def test_order_retried_only_when_refused(server, api, monkeypatch, status, sent):
+    monkeypatch.setattr(mockserver.random, "choice", lambda statuses: status)
+    api.retry = RetryPolicy(total=3, base=0.001, cap=0.001)
+    server.error_rate = 1
+    try:
+        before = server.requests
+        with pytest.raises(APIException):
+            api.sendchildorder(product_code="BTC_JPY", child_order_type="MARKET", side="BUY", size=0.01)
+        assert server.requests - before == sent
+    finally:
+        server.error_rate = 0
+
+
+def test_every_attempt_takes_budget_and_is_recorded(server, api):
+    metrics = pybitflyer.Metrics()
+    limiter = pybitflyer.RateLimiter()
+    api.metrics = metrics
+    api.rate_limiter = limiter
+    api.retry = RetryPolicy(total=20, base=0.001, cap=0.001)
+    server.error_rate = 0.5
+    try:
+        before = server.requests
+        budget = limiter.remaining()["ip"]
+        for _ in range(5):
+            api.ticker(product_code="BTC_JPY")
+        sent = server.requests - before
+    finally:
+        server.error_rate = 0
+    assert budget - limiter.remaining()["ip"] == sent
+    snapshot = metrics.snapshot()["/v1/ticker"]
+    assert sum(snapshot["requests"].values()) == sent
+    assert snapshot["requests"][200] == 5
+    assert snapshot["retries"] == sent - 5
+
+
+def test_non_json_error_pages_are_retried(server, api, monkeypatch):
+    monkeypatch.setattr(mockserver.random, "choice", lambda statuses: 502)
+    api.retry = RetryPolicy(total=5, base=0.001, cap=0.001)
+    server.error_rate = 1
+    server.error_page = b"<html><body><h1>502 Bad Gateway</h1></body></html>"
+    try:
+        before = server.requests
+        with pytest.raises(APIException) as e:
+            api.ticker(product_code="BTC_JPY")
+        assert server.requests - before == 6
+        assert e.value.status_code == 502 and e.value.response is None
+    finally:
+        server.error_rate = 0
+        server.error_page = None
+
+
+def test_waits_end_at_the_retry_deadline(server, api):
+    api.retry = RetryPolicy(total=3, deadline=0.3)
+    api.rate_limiter = pybitflyer.RateLimiter(ip=(1, 1))
+    api.ticker(product_code="BTC_JPY")
+    before = server.requests
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as e:
+        api.ticker(product_code="BTC_JPY")
+    assert time.monotonic() - start < 0.5
+    assert not e.value.sent and server.requests == before
+
+
+def test_lock_wait_ends_at_the_retry_deadline(api):
+    api.retry = RetryPolicy(total=3, deadline=0.2)
+    api.lock = threading.Lock()
+    with api.lock:
+        with pytest.raises(DeadlineExceeded):
+            api.ticker(product_code="BTC_JPY")
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import hmac
+import hashlib
+
+import pytest
+
+from pybitflyer import Signer
+
+
+def expected(secret, timestamp, method, path, body=b""):
+    text = str.encode(timestamp + method + path) + body
+    return hmac.new(str.encode(secret), text, hashlib.sha256).hexdigest()
+
+
+@pytest.mark.parametrize("secret", ["secret", "s" * 64, "x" * 100, ""])
+@pytest.mark.parametrize("method,path,body", [
+    ("GET", "/v1/me/getbalance", b""),
+    ("GET", "/v1/me/getchildorders?product_code=BTC_JPY&count=10", b""),
+    ("POST", "/v1/me/sendchildorder", b'{"product_code": "BTC_JPY", "size": 0.01}'),
+])
+def test_sign_matches_hmac(secret, method, path, body):
+    signer = Signer("key", secret)
+    assert signer.sign("1700000000.123", method, path, body) == \
+        expected(secret, "1700000000.123", method, path, body)
+
+
+def test_headers_are_signed_per_request():
+    signer = Signer("key", "secret")
+    header = signer.headers("POST", "/v1/me/sendchildorder", b"{}")
+    assert header["ACCESS-KEY"] == "key"
+    assert header["ACCESS-SIGN"] == expected("secret", header["ACCESS-TIMESTAMP"], "POST",
+                                             "/v1/me/sendchildorder", b"{}")
+    assert "ACCESS-SIGN" not in signer._template
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import pytest
+
+from pybitflyer import ExecutionStore
+
+np = pytest.importorskip("numpy")
+
+NEWEST = 2500000000
+
+
+def test_sync_in_ascending_order(api, tmp_path):
+    store = ExecutionStore(str(tmp_path), api)
+    since = datetime(2024, 1, 1) + timedelta(milliseconds=(NEWEST - 1199) * 7)
+    assert store.sync("BTC_JPY", since=since) == 1200
+    ids = store.columns("BTC_JPY")["id"]
+    assert ids[0] == NEWEST - 1199 and ids[-1] == NEWEST
+    assert (np.diff(ids) == 1).all()
+    # nothing newer on the mock, and no temporary files are left behind
+    assert store.sync("BTC_JPY") == 0
+    assert sorted(p.name for p in (tmp_path / "BTC_JPY").iterdir()) == \
+        ["exec_date", "id", "price", "side", "size"]
+
+
+def test_range(api, tmp_path):
+    store = ExecutionStore(str(tmp_path), api)
+    store.append("BTC_JPY", api.executions(product_code="BTC_JPY", count=100))
+    rows = store.ids("BTC_JPY", NEWEST - 10, NEWEST)
+    assert rows["id"].tolist() == list(range(NEWEST - 10, NEWEST))
+    dates = store.columns("BTC_JPY")["exec_date"]
+    rows = store.range("BTC_JPY", start=int(dates[50]), end=int(dates[60]))
+    assert len(rows["id"]) == 10
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+import pytest
+
+from pybitflyer.stream import (_MORE, _Reader, iter_rows, iter_board, aiter_rows, aiter_board,
+                               fill_executions, fill_board)
+
+np = pytest.importorskip("numpy")
+
+ROWS = [
+    {"id": 12345, "side": "BUY", "price": 10000000.5, "size": 0.001, "exec_date": "2024-01-01T00:00:00.123"},
+    {"id": 12346, "side": "SELL", "price": 1e7, "size": -1.25e-3, "exec_date": "2024-01-01T00:00:01"},
+    {"id": 12347, "side": "", "price": 123, "size": 10, "exec_date": "2024-01-01T00:00:02.5",
+     "note": "café ₿ [1, 2] {\"a\": 3}", "flags": [True, False, None]},
+]
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_rows_in_small_chunks(size):
+    data = json.dumps(ROWS, ensure_ascii=False).encode()
+    assert list(iter_rows(chunked(data, size))) == ROWS
+
+
+@pytest.mark.parametrize("size", [1, 3, 5])
+def test_whitespace_and_empty_arrays(size):
+    data = b' [ 1 ,\n 2.50 , -3e2 , "x" ] '
+    assert list(iter_rows(chunked(data, size))) == [1, 2.5, -300.0, "x"]
+    assert list(iter_rows(chunked(b" [ ] ", size))) == []
+
+
+def test_number_split_at_chunk_end():
+    # "12" then ".5": a number is complete only once a delimiter follows
+    assert list(iter_rows([b"[12", b".5,3", b"4]"])) == [12.5, 34]
+
+
+def test_values_are_decoded_once_complete():
+    reader = _Reader()
+    reader.feed(b'{"a": [1, ')
+    assert reader.value() is _MORE
+    reader.feed(b'2]}')
+    reader.feed(None)
+    assert reader.value() == {"a": [1, 2]}
+    assert reader.peek() == ""
+
+
+@pytest.mark.parametrize("size", [1, 7, 100000])
+def test_async_parsers(size):
+    async def chunks(data):
+        for chunk in chunked(data, size):
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def collect(items):
+        return [item async for item in items]
+
+    data = json.dumps(ROWS, ensure_ascii=False).encode()
+    assert asyncio.run(collect(aiter_rows(chunks(data)))) == ROWS
+    board = {"mid_price": 100.0, "bids": [{"price": 99.0, "size": 1.0}], "asks": []}
+    assert asyncio.run(collect(aiter_board(chunks(json.dumps(board).encode())))) == \
+        [("mid_price", 100.0), ("bids", board["bids"][0])]
+
+
+def test_invalid_json_raises():
+    with pytest.raises(ValueError):
+        list(iter_rows([b"[1, 2", b" 3]"]))
+    with pytest.raises(ValueError):
+        list(iter_rows([b"[1, 2"]))
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_board(size):
+    board = {"mid_price": 100.0, "bids": [{"price": 99.0, "size": 1.0}, {"price": 98.0, "size": 2.0}],
+             "asks": [{"price": 101.0, "size": 0.5}]}
+    items = list(iter_board(chunked(json.dumps(board).encode(), size)))
+    assert items == [("mid_price", 100.0), ("bids", board["bids"][0]), ("bids", board["bids"][1]),
+                     ("asks", board["asks"][0])]
+    bids, asks = np.zeros((1, 2)), np.zeros((4, 2))
+    assert fill_board(items, bids, asks) == (100.0, 1, 1)
+    assert bids.tolist() == [[99.0, 1.0]]
+    assert asks[0].tolist() == [101.0, 0.5]
+
+
+def test_fill_executions():
+    columns = {"id": np.zeros(2, "<i8"), "price": np.zeros(2), "side": np.zeros(2, "i1"),
+               "exec_date": np.zeros(2, "<i8")}
+    assert fill_executions(iter(ROWS), columns) == 2
+    assert columns["id"].tolist() == [12345, 12346]
+    assert columns["side"].tolist() == [1, -1]
+    assert columns["exec_date"][1] - columns["exec_date"][0] == 877
+
+
+def test_api_streams(api):
+    rows = list(api.executions_stream(product_code="BTC_JPY", count=200))
+    assert rows == api.executions(product_code="BTC_JPY", count=200)
+    levels = list(api.board_stream(product_code="BTC_JPY"))
+    board = api.board(product_code="BTC_JPY")
+    assert len(levels) == 1 + len(board["bids"]) + len(board["asks"])